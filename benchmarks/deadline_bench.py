@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Latency distribution per invoice with and without a per-document deadline.
+
+The sample invoices are padded into longer documents (each page repeated
+--copies times) so page counts vary the way production traffic does.
+
+Usage:
+  python -m benchmarks.deadline_bench --pdf invoices/ --method regex --deadline 10
+  python -m benchmarks.deadline_bench --pdf invoices/ --method llm --deadline 10 --copies 1 3 6
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import fitz
+
+from main import METHOD_DISPATCH
+from src.Deadline import summarize_deadlines
+from src.OCRProcessor import OCRProcessor
+
+
+def build_corpus(pdf_dir: Path, out_dir: Path, copies) -> list:
+    """Write every sample PDF with each page repeated k times, for k in copies."""
+    paths = []
+    for pdf in sorted(Path(pdf_dir).glob("*.pdf")):
+        with fitz.open(pdf) as src:
+            for k in copies:
+                doc = fitz.open()
+                for _ in range(k):
+                    doc.insert_pdf(src)
+                path = out_dir / f"{pdf.stem}_x{k}.pdf"
+                doc.save(path)
+                doc.close()
+                paths.append(path)
+    return paths
+
+
+def run(method: str, pdfs, output_dir: Path, deadline, options) -> list:
+    reports = []
+    for pdf in pdfs:
+        start = time.monotonic()
+        extractor = METHOD_DISPATCH[method](
+            pdf, output_dir, deadline=deadline, **options
+        )
+        reports.append(
+            extractor.timings.get("deadline")
+            or {
+                "budget_sec": None,
+                "elapsed_sec": round(time.monotonic() - start, 3),
+                "met": True,
+                "degradations": [],
+            }
+        )
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deadline latency benchmark")
+    parser.add_argument("--pdf", default="invoices", type=str)
+    parser.add_argument("--method", default="regex", choices=list(METHOD_DISPATCH))
+    parser.add_argument("--deadline", default=10.0, type=float)
+    parser.add_argument("--copies", default=[1, 3, 6], type=int, nargs="+")
+    args = parser.parse_args()
+
+    # One OCR engine for every run, so model loading is not part of latency
+    options = {"ocr_processor": OCRProcessor()}
+    if args.method == "layout":
+        from src.Layout import LayoutLvm3
+
+        options["layout_model"] = LayoutLvm3()
+
+    with TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        pdfs = build_corpus(Path(args.pdf), tmp, args.copies)
+        print(f"{len(pdfs)} documents, page copies {args.copies}")
+        summaries = {}
+        for name, deadline in (("no deadline", None), ("deadline", args.deadline)):
+            reports = run(args.method, pdfs, tmp / name.replace(" ", "_"), deadline, options)
+            summary = summarize_deadlines(reports)
+            # Baseline "met" means: would it have fit the same budget?
+            summary["met_rate"] = round(
+                sum(r["elapsed_sec"] <= args.deadline for r in reports) / len(reports), 4
+            )
+            summaries[name] = summary
+
+    print(f"\nbudget {args.deadline}s, method {args.method}")
+    print(f"{'':14}{'p50':>8}{'p90':>8}{'p99':>8}{'max':>8}{'met':>8}")
+    for name, s in summaries.items():
+        print(
+            f"{name:14}{s['p50_sec']:8.2f}{s['p90_sec']:8.2f}{s['p99_sec']:8.2f}"
+            f"{s['max_sec']:8.2f}{s['met_rate']:8.0%}"
+        )
+    print("degradations:", json.dumps(summaries["deadline"]["degradations"]))
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Packed (multi-invoice) vs one-request-per-invoice LLM extraction.
+
+Uses the OCR texts of a previous run (outputs/<method>/<stem>/texts) as the
+documents and the local OpenAI-compatible stub of `llm_stream_bench`, which
+charges a fixed round trip plus prefill and decode time per token.
+
+Usage:
+  python -m benchmarks.llm_batch_bench --texts outputs/regex --copies 10 --budget 6000
+  python -m benchmarks.llm_batch_bench --drop-every 4   # exercise single-doc fallback
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+from openai import OpenAI
+
+from benchmarks.llm_stream_bench import StubHandler
+from main import LLM_MODEL, LLM_SYSTEM_PROMPT
+from src.LLMBatching import LLMInvoiceBatcher
+
+_DOC = re.compile(r"<<<DOC id=(\w+)>>>\n(.*?)\n<<<END DOC>>>", re.DOTALL)
+
+
+class BatchStubHandler(StubHandler):
+    """Also answers packed requests, optionally leaving out every Nth entry."""
+
+    drop_every = 0
+
+    def _completion_text(self, body) -> str:
+        content = body["messages"][1]["content"]
+        docs = _DOC.findall(content)
+        if not docs:
+            return super()._completion_text(body)
+        entries = [
+            {"doc_id": doc_id, "invoice": self.find_invoice(text)}
+            for k, (doc_id, text) in enumerate(docs, start=1)
+            if not (self.drop_every and k % self.drop_every == 0)
+        ]
+        return json.dumps({"invoices": entries}, indent=2)
+
+
+class TextJob:
+    """Stand-in for a prepared LLMInvoiceExtractor (OCR already done)."""
+
+    def __init__(self, client, doc_key: str, text: str):
+        self.client = client
+        self.doc_key = doc_key
+        self.messages = [
+            {"role": "system", "content": LLM_SYSTEM_PROMPT},
+            {"role": "user", "content": text},
+        ]
+        self.result = None
+
+    def complete_blocking(self, messages):
+        response = self.client.chat.completions.create(
+            model=LLM_MODEL,
+            response_format={"type": "json_object"},
+            temperature=0,
+            messages=messages,
+        )
+        usage = response.usage.model_dump() if response.usage else {}
+        return json.loads(response.choices[0].message.content), usage
+
+    def finish(self, result, usage):
+        self.result, self.usage = result, usage
+
+
+def load_documents(texts_dir: Path, copies: int):
+    docs = []
+    for doc_dir in sorted(p for p in texts_dir.iterdir() if (p / "texts").is_dir()):
+        pages = sorted(
+            (doc_dir / "texts").glob("page*.txt"), key=lambda p: int(p.stem[4:])
+        )
+        text = "\n".join(
+            f"=== Page {i} ===\n{p.read_text(encoding='utf8')}"
+            for i, p in enumerate(pages, start=1)
+        )
+        docs += [(f"{doc_dir.name}#{k}", text) for k in range(copies)]
+    return docs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM request packing benchmark")
+    parser.add_argument("--texts", default="outputs/regex", type=str)
+    parser.add_argument("--ground-truths", default="ground_truths", type=str)
+    parser.add_argument("--copies", default=10, type=int)
+    parser.add_argument("--budget", default=6000, type=int, help="Prompt tokens per request")
+    parser.add_argument("--ttft", default=0.4, type=float)
+    parser.add_argument("--tps", default=80.0, type=float)
+    parser.add_argument("--drop-every", default=0, type=int)
+    args = parser.parse_args()
+
+    BatchStubHandler.invoices = {
+        p.stem: json.loads(p.read_text()) for p in Path(args.ground_truths).glob("*.json")
+    }
+    BatchStubHandler.ttft, BatchStubHandler.tps = args.ttft, args.tps
+    BatchStubHandler.drop_every = args.drop_every
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BatchStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = OpenAI(base_url=f"http://127.0.0.1:{server.server_port}/v1", api_key="stub")
+
+    docs = load_documents(Path(args.texts), args.copies)
+    print(f"{len(docs)} documents, budget {args.budget} prompt tokens/request")
+
+    # ── unbatched: one request per invoice
+    start = time.perf_counter()
+    tokens = 0
+    for key, text in docs:
+        job = TextJob(client, key, text)
+        _, usage = job.complete_blocking(job.messages)
+        tokens += usage["total_tokens"]
+    unbatched_sec = time.perf_counter() - start
+    rows = {
+        "unbatched": (len(docs), tokens / len(docs), len(docs) / unbatched_sec * 60)
+    }
+
+    # ── packed
+    batcher = LLMInvoiceBatcher(client, LLM_MODEL, LLM_SYSTEM_PROMPT, args.budget)
+    jobs = [TextJob(client, key, text) for key, text in docs]
+    start = time.perf_counter()
+    for job in jobs:
+        batcher.add(job)
+    batcher.close()
+    packed_sec = time.perf_counter() - start
+    report = batcher.report()
+    rows["packed"] = (
+        report["requests"],
+        report["tokens_per_invoice"],
+        len(docs) / packed_sec * 60,
+    )
+    assert all(job.result for job in jobs)
+    server.shutdown()
+
+    print(f"{'':12}{'requests':>10}{'tokens/inv':>12}{'inv/min':>10}")
+    for name, (requests, per_invoice, per_min) in rows.items():
+        print(f"{name:12}{requests:10d}{per_invoice:12.1f}{per_min:10.1f}")
+    print(
+        f"packed: {report['batched_requests']} batched requests, "
+        f"{report['fallbacks']} single-document fallbacks"
+    )
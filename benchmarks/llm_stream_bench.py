@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Streaming vs blocking LLM extraction against a local OpenAI-compatible stub.
+
+The stub replays the ground-truth invoices as chat completions with a fixed
+time-to-first-token and token rate, so the comparison isolates the client
+side: time to first usable field and total latency.
+
+Usage:
+  python -m benchmarks.llm_stream_bench --ttft 0.4 --tps 80
+  python -m benchmarks.llm_stream_bench --diverge   # first stream breaks the schema
+"""
+
+import argparse
+import json
+import re
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from openai import OpenAI
+
+from src.LLMStreaming import stream_invoice
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """POST /v1/chat/completions; replays the ground truth of the invoice named
+    in the user message (by file stem or by its invoice number)."""
+
+    invoices = {}
+    ttft = 0.4
+    tps = 80.0
+    prefill_tps = 4000.0
+    diverge = False
+
+    def log_message(self, *args):
+        pass
+
+    def find_invoice(self, content: str) -> dict:
+        if content in self.invoices:
+            return self.invoices[content]
+        return next(
+            (gt for gt in self.invoices.values() if gt["invoice_no"] in content), {}
+        )
+
+    def _completion_text(self, body) -> str:
+        messages = body["messages"]
+        text = json.dumps(self.find_invoice(messages[1]["content"]), indent=2)
+        if self.diverge and len(messages) == 2:
+            # Break the schema at the first item: qty as a string
+            text = re.sub(r'"qty": (\d+)', r'"qty": "\1"', text, count=1)
+        return text
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        text = self._completion_text(body)
+        tokens = [text[i : i + 4] for i in range(0, len(text), 4)]
+        prompt_tokens = sum(len(m["content"]) for m in body["messages"]) // 4
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens),
+        }
+        base = {"id": "stub", "created": 0, "model": body["model"]}
+        # Prefill cost grows with the prompt, on top of the fixed round trip
+        time.sleep(self.ttft + prompt_tokens / self.prefill_tps)
+
+        if not body.get("stream"):
+            time.sleep(len(tokens) / self.tps)
+            payload = {
+                **base,
+                "object": "chat.completion",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            }
+            data = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        try:
+            for tok in tokens:
+                chunk = {
+                    **base,
+                    "object": "chat.completion.chunk",
+                    "choices": [
+                        {"index": 0, "delta": {"content": tok}, "finish_reason": None}
+                    ],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(1 / self.tps)
+            final = {**base, "object": "chat.completion.chunk", "choices": [], "usage": usage}
+            self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode())
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client aborted the stream after a divergence
+
+
+def blocking(client, messages):
+    start = time.perf_counter()
+    response = client.chat.completions.create(
+        model="stub",
+        response_format={"type": "json_object"},
+        temperature=0,
+        messages=messages,
+    )
+    json.loads(response.choices[0].message.content)
+    elapsed = time.perf_counter() - start
+    # Nothing is usable before the whole body has arrived
+    return elapsed, elapsed, 0
+
+
+def streaming(client, messages):
+    result, usage, stats = stream_invoice(client, "stub", messages)
+    return stats["first_field_sec"], stats["total_sec"], stats["reasks"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming LLM benchmark")
+    parser.add_argument("--ground-truths", default="ground_truths", type=str)
+    parser.add_argument("--ttft", default=0.4, type=float, help="Seconds to first token")
+    parser.add_argument("--tps", default=80.0, type=float, help="Tokens per second")
+    parser.add_argument("--runs", default=3, type=int)
+    parser.add_argument("--diverge", action="store_true")
+    args = parser.parse_args()
+
+    StubHandler.invoices = {
+        p.stem: json.loads(p.read_text()) for p in Path(args.ground_truths).glob("*.json")
+    }
+    StubHandler.ttft, StubHandler.tps, StubHandler.diverge = (
+        args.ttft,
+        args.tps,
+        args.diverge,
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = OpenAI(base_url=f"http://127.0.0.1:{server.server_port}/v1", api_key="stub")
+
+    rows = {"blocking": blocking, "streaming": streaming}
+    print(f"stub: ttft {args.ttft}s, {args.tps} tok/s, diverge={args.diverge}")
+    print(f"{'':12}{'first field s':>15}{'total s':>10}{'re-asks':>9}")
+    for name, fn in rows.items():
+        first, total, reasks = [], [], 0
+        for _ in range(args.runs):
+            for stem in StubHandler.invoices:
+                messages = [
+                    {"role": "system", "content": "invoice JSON"},
+                    {"role": "user", "content": stem},
+                ]
+                f, t, r = fn(client, messages)
+                first.append(f)
+                total.append(t)
+                reasks += r
+        print(
+            f"{name:12}{statistics.median(first):15.3f}"
+            f"{statistics.median(total):10.3f}{reasks:9d}"
+        )
+    server.shutdown()
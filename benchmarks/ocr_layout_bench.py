@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Compare the columnar DocumentLayout with the old list-of-dicts layout_data.
+
+Usage:
+  python -m benchmarks.ocr_layout_bench --pages 500 --lines 80
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from src.OCRLayout import DocumentLayout, PageLayout, polys_to_xywh
+
+
+def synthetic_ocr(n_pages: int, n_lines: int, seed: int = 0):
+    """Per page: (lines, scores, polygons) shaped like PaddleOCR output."""
+    rng = np.random.default_rng(seed)
+    pages = []
+    for _ in range(n_pages):
+        xy = rng.integers(0, 2400, size=(n_lines, 1, 2))
+        wh = rng.integers(20, 400, size=(n_lines, 1, 2))
+        corners = np.array([[0, 0], [1, 0], [1, 1], [0, 1]])
+        polys = (xy + corners * wh).astype(np.int16)
+        scores = rng.uniform(0.6, 1.0, n_lines)
+        lines = [f"Line {i}: Amount ${rng.uniform(1, 1e4):.2f}" for i in range(n_lines)]
+        pages.append((lines, scores, list(polys)))
+    return pages
+
+
+def build_dicts(pages):
+    """The previous layout_data construction (per-point list comprehensions)."""
+    layout_data = []
+    for idx, (lines, scores, polys) in enumerate(pages, start=1):
+        boxes = []
+        for poly in polys:
+            x_coords = [pt[0] for pt in poly]
+            y_coords = [pt[1] for pt in poly]
+            x, y = min(x_coords), min(y_coords)
+            w, h = max(x_coords) - x, max(y_coords) - y
+            boxes.append([x, y, w, h])
+        for b, t, s in zip(boxes, lines, [float(s) for s in scores]):
+            layout_data.append({"page": idx, "text": t, "score": round(s, 3), "box": b})
+    return layout_data
+
+
+def build_columnar(pages):
+    layout = DocumentLayout()
+    for idx, (lines, scores, polys) in enumerate(pages, start=1):
+        layout.append(PageLayout.from_ocr(idx, lines, scores, polys_to_xywh(polys)))
+    len(layout)  # force the merge
+    return layout
+
+
+def measure(fn, pages):
+    gc.collect()
+    objects_before = len(gc.get_objects())
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn(pages)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    objects = len(gc.get_objects()) - objects_before
+    t0 = time.perf_counter()
+    gc.collect()
+    gc_time = time.perf_counter() - t0
+    return result, elapsed, peak, objects, gc_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OCR layout storage benchmark")
+    parser.add_argument("--pages", default=500, type=int)
+    parser.add_argument("--lines", default=80, type=int, help="OCR lines per page")
+    args = parser.parse_args()
+
+    pages = synthetic_ocr(args.pages, args.lines)
+    rows = [("list of dicts", build_dicts), ("DocumentLayout", build_columnar)]
+    results = {}
+    print(f"{args.pages} pages × {args.lines} lines = {args.pages * args.lines} records")
+    print(f"{'':16}{'build ms':>10}{'peak MiB':>10}{'gc objs':>10}{'gc ms':>8}")
+    for name, fn in rows:
+        res, elapsed, peak, objects, gc_time = measure(fn, pages)
+        results[name] = res
+        print(
+            f"{name:16}{elapsed * 1e3:10.1f}{peak / 2**20:10.2f}"
+            f"{objects:10d}{gc_time * 1e3:8.1f}"
+        )
+
+    layout = results["DocumentLayout"]
+    with TemporaryDirectory() as tmp:
+        path = Path(tmp) / "layout.npz"
+        t0 = time.perf_counter()
+        layout.save_npz(path)
+        save = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        DocumentLayout.load_npz(path)
+        load = time.perf_counter() - t0
+        print(
+            f"npz: {path.stat().st_size / 2**20:.2f} MiB, "
+            f"save {save * 1e3:.1f} ms, load {load * 1e3:.1f} ms"
+        )
+    assert layout[0]["text"] == results["list of dicts"][0]["text"]
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+OCR on raw vs preprocessed pages of a synthetic scanned corpus.
+
+Every page of the sample invoices is turned into a fake scan: pasted with
+wide margins on a tinted sheet, rotated by a small random angle, blurred and
+sprinkled with sensor noise and speckle. The same scans are then OCR'd as is,
+after `PagePreprocessor` (grayscale + crop + deskew) and with binarization
+too. Reports OCR time, preprocessing time per step, OCR input size and the
+mean recognition confidence.
+
+Usage:
+  python -m benchmarks.preprocess_bench --pdf invoices/ --copies 2
+  python -m benchmarks.preprocess_bench --max-skew 4 --dpi 200
+"""
+
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+import fitz
+import numpy as np
+from PIL import Image, ImageFilter
+
+from src.OCRProcessor import OCRProcessor
+from src.Preprocessing import PagePreprocessor
+
+
+def fake_scan(page: Image.Image, rng: np.random.Generator, max_skew: float) -> Image.Image:
+    w, h = page.size
+    sheet = Image.new("RGB", (int(w * 1.35), int(h * 1.25)), (246, 242, 228))
+    offset = (int(rng.integers(0, sheet.width - w)), int(rng.integers(0, sheet.height - h)))
+    # White page background becomes the paper tint
+    ink = np.asarray(page.convert("L")) < 250
+    sheet_px = np.array(sheet)
+    region = sheet_px[offset[1] : offset[1] + h, offset[0] : offset[0] + w]
+    region[ink] = np.asarray(page)[ink]
+    sheet = Image.fromarray(sheet_px).rotate(
+        float(rng.uniform(-max_skew, max_skew)),
+        resample=Image.BILINEAR,
+        fillcolor=(246, 242, 228),
+    )
+    sheet = sheet.filter(ImageFilter.GaussianBlur(0.7))
+    px = np.asarray(sheet).astype(np.int16)
+    px += rng.normal(0, 6, px.shape[:2]).astype(np.int16)[..., None]
+    speckle = rng.random(px.shape[:2]) < 2e-4
+    px[speckle] = 40
+    return Image.fromarray(np.clip(px, 0, 255).astype(np.uint8))
+
+
+def build_corpus(pdfs, copies: int, dpi: int, max_skew: float):
+    rng = np.random.default_rng(0)
+    scans = []
+    for pdf in pdfs:
+        with fitz.open(pdf) as doc:
+            for page in doc:
+                pix = page.get_pixmap(dpi=dpi)
+                img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+                scans += [fake_scan(img, rng, max_skew) for _ in range(copies)]
+    return scans
+
+
+def run_mode(ocr: OCRProcessor, scans):
+    ocr_sec, pixels, confidences = 0.0, 0, []
+    steps = {}
+    for img in scans:
+        start = time.perf_counter()
+        _, scores, _, _ = ocr.run_ocr_arrays(img)
+        ocr_sec += time.perf_counter() - start
+        confidences += scores.tolist()
+        report = ocr.last_preprocess
+        if ocr.preprocessor is None:
+            pixels += img.width * img.height
+            continue
+        pixels += int(img.width * img.height * report["area_kept"])
+        for step, ms in report["timings_ms"].items():
+            steps[step] = steps.get(step, 0.0) + ms
+    n = len(scans)
+    return {
+        "sec_per_page": ocr_sec / n,
+        "mpix_per_page": pixels / n / 1e6,
+        "mean_conf": statistics.fmean(confidences) * 100 if confidences else 0.0,
+        "lines_per_page": len(confidences) / n,
+        "steps_ms": {k: v / n for k, v in steps.items()},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OCR preprocessing benchmark")
+    parser.add_argument("--pdf", default="invoices", type=str)
+    parser.add_argument("--copies", default=2, type=int, help="Scans per PDF page")
+    parser.add_argument("--dpi", default=300, type=int)
+    parser.add_argument("--max-skew", default=3.0, type=float, help="Degrees")
+    args = parser.parse_args()
+
+    pdfs = sorted(Path(args.pdf).glob("*.pdf")) if Path(args.pdf).is_dir() else [args.pdf]
+    scans = build_corpus(pdfs, args.copies, args.dpi, args.max_skew)
+    print(f"{len(scans)} synthetic scans from {len(pdfs)} PDFs")
+
+    ocr = OCRProcessor(dpi=args.dpi)
+    ocr.run_ocr_arrays(scans[0])  # warm-up: model load + first-call allocations
+
+    modes = {
+        "raw": None,
+        "preprocess": PagePreprocessor(),
+        "+binarize": PagePreprocessor(binarize=True),
+    }
+    rows = {}
+    for name, preprocessor in modes.items():
+        ocr.preprocessor = preprocessor
+        rows[name] = run_mode(ocr, scans)
+
+    print(f"{'':12}{'OCR s/page':>12}{'Mpix':>7}{'lines':>8}{'mean conf %':>13}")
+    for name, r in rows.items():
+        print(
+            f"{name:12}{r['sec_per_page']:12.3f}{r['mpix_per_page']:7.2f}"
+            f"{r['lines_per_page']:8.1f}{r['mean_conf']:13.2f}"
+        )
+    for name, r in rows.items():
+        if r["steps_ms"]:
+            steps = ", ".join(f"{k} {v:.1f}" for k, v in r["steps_ms"].items())
+            print(f"{name} step ms/page: {steps}")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark the OCR spatial index on synthetic pages with thousands of boxes.
+
+Usage:
+  python -m benchmarks.spatial_index_bench --boxes 5000 --queries 500
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from src.SpatialIndex import PageSpatialIndex
+
+
+def synthetic_page(n_boxes: int, n_cols: int = 4, seed: int = 0):
+    """Label/value pairs laid out in *n_cols* side-by-side columns."""
+    rng = np.random.default_rng(seed)
+    texts, boxes = [], []
+    rows = int(np.ceil(n_boxes / (2 * n_cols)))
+    for r in range(rows):
+        for c in range(n_cols):
+            x = 40 + c * 600 + rng.uniform(-2, 2)
+            y = 40 + r * 28 + rng.uniform(-2, 2)
+            texts.append(f"Field {r}-{c}:")
+            boxes.append([x, y, 180, 20])
+            texts.append(f"value-{r}-{c}")
+            boxes.append([x + 220, y + rng.uniform(-2, 2), 150, 20])
+    return texts[:n_boxes], boxes[:n_boxes]
+
+
+def linear_right_of(texts, boxes, label):
+    """Baseline: rescan every line for the label, then every line for the value."""
+    for t, (x, y, w, h) in zip(texts, boxes):
+        if label.lower() in t.lower():
+            best = None
+            for t2, (x2, y2, w2, h2) in zip(texts, boxes):
+                if x2 > x + w / 2 and min(y + h, y2 + h2) - max(y, y2) >= h / 2:
+                    if best is None or x2 < best[0]:
+                        best = (x2, t2)
+            return best[1] if best else None
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Spatial index benchmark")
+    parser.add_argument("--boxes", default=5000, type=int, help="Boxes per page")
+    parser.add_argument("--queries", default=500, type=int, help="Lookups to time")
+    args = parser.parse_args()
+
+    texts, boxes = synthetic_page(args.boxes)
+    rng = np.random.default_rng(1)
+    labels = [texts[i] for i in rng.integers(0, len(texts) // 2, args.queries) * 2]
+
+    t0 = time.perf_counter()
+    index = PageSpatialIndex(texts, boxes)
+    build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    fast = [index.right_of(lbl) for lbl in labels]
+    indexed = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    slow = [linear_right_of(texts, boxes, lbl) for lbl in labels]
+    linear = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    index.reading_order_text("columns")
+    reading = time.perf_counter() - t0
+
+    agree = sum(a == b for a, b in zip(fast, slow))
+    print(f"boxes={len(texts)} rows={len(index.rows())} queries={len(labels)}")
+    print(f"build index          {build * 1e3:8.2f} ms")
+    print(f"reading order text   {reading * 1e3:8.2f} ms")
+    print(f"right_of (indexed)   {indexed / len(labels) * 1e6:8.1f} µs/query")
+    print(f"right_of (linear)    {linear / len(labels) * 1e6:8.1f} µs/query")
+    print(f"speed-up             {linear / indexed:8.1f}x  ({agree}/{len(labels)} agree)")
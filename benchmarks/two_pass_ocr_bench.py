@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Two-pass adaptive-resolution OCR vs the fixed 300 DPI baseline.
+
+Runs the regex pipeline over the sample invoices with both OCR modes and
+reports OCR throughput plus `InvoiceEvaluator` accuracy for each.
+
+Usage:
+  python -m benchmarks.two_pass_ocr_bench --pdf invoices/ --ground-truths ground_truths
+  python -m benchmarks.two_pass_ocr_bench --low-dpi 120 --min-score 0.95
+"""
+
+import argparse
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import fitz
+
+from evaluation import InvoiceEvaluator
+from src.InvoiceExtractors import RegexInvoiceExtractor
+from src.OCRProcessor import OCRProcessor
+
+
+def run_mode(ocr: OCRProcessor, pdfs, output_dir: Path, gt_dir: Path):
+    pages, ocr_sec = 0, 0.0
+    start = time.perf_counter()
+    for pdf in pdfs:
+        extractor = RegexInvoiceExtractor(pdf, output_dir, ocr_processor=ocr)
+        extractor.extract()
+        pages += len(extractor.pages_text)
+        ocr_sec += extractor.timings["ocr_sec"]
+    wall = time.perf_counter() - start
+
+    evaluator = InvoiceEvaluator(gt_dir, output_dir, output_dir / "evaluation")
+    evaluator.evaluate()
+    summary, _ = evaluator.report()
+    return {
+        "pages": pages,
+        "ocr_sec": round(ocr_sec, 2),
+        "pages_per_sec": round(pages / ocr_sec, 3) if ocr_sec else 0.0,
+        "wall_sec": round(wall, 2),
+        "accuracy": summary,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Two-pass OCR benchmark")
+    parser.add_argument("--pdf", default="invoices", type=str)
+    parser.add_argument("--ground-truths", default="ground_truths", type=str)
+    parser.add_argument("--dpi", default=300, type=int, help="Baseline / re-read DPI")
+    parser.add_argument("--low-dpi", default=150, type=int)
+    parser.add_argument("--min-score", default=0.9, type=float)
+    args = parser.parse_args()
+
+    pdfs = sorted(Path(args.pdf).glob("*.pdf"))
+    gt_dir = Path(args.ground_truths)
+    modes = {
+        f"fixed {args.dpi} dpi": OCRProcessor(dpi=args.dpi),
+        f"two-pass {args.low_dpi}→{args.dpi}": OCRProcessor(
+            dpi=args.dpi,
+            two_pass=True,
+            low_dpi=args.low_dpi,
+            min_score=args.min_score,
+        ),
+    }
+
+    results = {}
+    with TemporaryDirectory() as tmp:
+        for name, ocr in modes.items():
+            # Warm-up page so model initialisation is not timed
+            with fitz.open(pdfs[0]) as doc:
+                ocr.run_ocr(ocr.render_page(doc[0]), doc[0])
+            ocr.refine_stats = dict.fromkeys(ocr.refine_stats, 0)
+            results[name] = run_mode(ocr, pdfs, Path(tmp) / name.split()[0], gt_dir)
+            if ocr.two_pass:
+                results[name]["refine"] = dict(ocr.refine_stats)
+
+    print(f"\n{len(pdfs)} invoices")
+    print(f"{'':22}{'pages/s':>9}{'OCR s':>8}{'PO %':>8}{'items %':>9}{'totals %':>10}")
+    for name, r in results.items():
+        acc = r["accuracy"]
+        print(
+            f"{name:22}{r['pages_per_sec']:9.3f}{r['ocr_sec']:8.2f}"
+            f"{acc.get('PO Accuracy (%)', 0):8.1f}"
+            f"{acc.get('Line-item Accuracy (%)', 0):9.1f}"
+            f"{acc.get('Total-fields Accuracy (%)', 0):10.1f}"
+        )
+    for name, r in results.items():
+        if "refine" in r:
+            ref = r["refine"]
+            print(
+                f"{name}: re-read {ref['rechecked']}/{ref['lines']} lines, "
+                f"{ref['replaced']} replaced"
+            )
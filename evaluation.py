@@ -7,6 +7,14 @@ Usage (stand-alone):
         --predictions outputs/regex \
         --out-dir     reports/regex_eval
 
+Predictions can also be read straight from a bulk result sink written with
+``main.py --sink`` (.jsonl, .parquet or .sqlite):
+
+    python evaluation.py \
+        --ground-truths ground_truths \
+        --predictions outputs/results.sqlite \
+        --method      regex
+
 It can still be imported from *main.py*:
 
     from evaluation import InvoiceEvaluator
@@ -29,6 +37,8 @@ from typing import Dict, List, Tuple, Any
 
 import pandas as pd
 
+from src.ResultSinks import SINK_SUFFIXES, open_result_sink
+
 # ────────────────────────────────────────────────────────────────────────────────
 # Helper functions
 # ────────────────────────────────────────────────────────────────────────────────
@@ -75,14 +85,21 @@ class InvoiceEvaluator:
         prediction_dir: Path,
         output_dir: Path | None = None,
         tol: float = 1e-2,
+        method: str | None = None,
     ) -> None:
         self.gt_dir = ground_truth_dir
         self.pred_dir = prediction_dir
         self.tol = tol
+        self.method = method
         self.results: List[Dict[str, Any]] = []
-        self.output_dir = (
-            output_dir if output_dir is not None else prediction_dir / "evaluation"
+        #: Predictions come from a bulk sink file instead of per-invoice folders
+        self.from_sink = prediction_dir.suffix.lower() in SINK_SUFFIXES
+        default_out = (
+            prediction_dir.with_name(f"{prediction_dir.stem}_evaluation")
+            if self.from_sink
+            else prediction_dir / "evaluation"
         )
+        self.output_dir = output_dir if output_dir is not None else default_out
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
     # ─────────────────────────────────────────────────────────────────── compare ──
@@ -136,17 +153,28 @@ class InvoiceEvaluator:
         }
 
     # ──────────────────────────────────────────────────────────────── public API ──
+    def _load_sink_predictions(self) -> Dict[str, Dict[str, Any]]:
+        sink = open_result_sink(self.pred_dir)
+        try:
+            return sink.read_predictions(self.method)
+        finally:
+            sink.close()
+
     def evaluate(self) -> None:
         """Populate *self.results* for every ground-truth file we find."""
         self.results.clear()
+        sink_predictions = self._load_sink_predictions() if self.from_sink else {}
         for gt_path in sorted(self.gt_dir.glob("*.json")):
             name = gt_path.stem
-            pred_path = self.pred_dir / name / "invoice.json"
-            if not pred_path.exists():
+            if self.from_sink:
+                pred_json = sink_predictions.get(name)
+            else:
+                pred_path = self.pred_dir / name / "invoice.json"
+                pred_json = _load_json(pred_path) if pred_path.exists() else None
+            if pred_json is None:
                 print(f"❌ Missing prediction for {name}")
                 continue
             gt_json = _load_json(gt_path)
-            pred_json = _load_json(pred_path)
             metrics = self._compare(gt_json, pred_json)
             metrics["file"] = name
             self.results.append(metrics)
@@ -206,11 +234,15 @@ class InvoiceEvaluator:
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Evaluate invoice-extraction predictions.")
     parser.add_argument("--ground-truths", required=True, type=Path, help="Directory with ground-truth JSON files")
-    parser.add_argument("--predictions", required=True, type=Path, help="Directory with model predictions (one sub-folder per PDF)")
+    parser.add_argument("--predictions", required=True, type=Path, help="Directory with model predictions (one sub-folder per PDF) or a result sink file")
     parser.add_argument("--out-dir", type=Path, default=None, help="Where to save CSV/JSON reports (defaults to <predictions>/evaluation)")
     parser.add_argument("--tol", type=float, default=1e-2, help="Numeric tolerance when comparing floats (default 0.01)")
+    parser.add_argument("--method", default=None, help="Only use sink records of this method (regex/llm); required when the sink holds several")
     args = parser.parse_args()
 
-    evaluator = InvoiceEvaluator(args.ground_truths, args.predictions, args.out_dir)
-    evaluator.evaluate()
+    evaluator = InvoiceEvaluator(args.ground_truths, args.predictions, args.out_dir, args.tol, args.method)
+    try:
+        evaluator.evaluate()
+    except ValueError as e:  # a sink of several methods without --method
+        parser.error(str(e))
     evaluator.report()
\ No newline at end of file
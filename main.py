@@ -6,31 +6,71 @@ Usage:
   python main.py --method regex  --pdf path/to/invoice.pdf
   python main.py --method llm    --pdf path/to/invoice.pdf
   python main.py --method layout --pdf path/to/invoice.pdf
+
+  # A directory of PDFs, with every result also appended to a bulk sink
+  python main.py --method regex --pdf invoices/ --sink outputs/results.sqlite
+
+  # Parallel workers on a calibrated cores split (--workers 0 = auto)
+  python main.py --method regex --pdf invoices/ --workers 0
+
+  # Low-DPI OCR with high-DPI re-reads of weak lines only
+  python main.py --method regex --pdf invoices/ --two-pass-ocr
+
+  # Crop margins and deskew scanned pages before OCR
+  python main.py --method regex --pdf scans/ --preprocess
+
+  # Hard 10 s budget per invoice, degrading quality instead of running late
+  python main.py --method llm --pdf invoices/ --deadline 10
+
+  # One OCR pass per PDF shared by all three methods, plus a comparison report
+  python main.py --method all --pdf invoices/ --ground-truths ground_truths
+
+  # Daemon: extract every PDF dropped into inbox/ with 4 workers
+  python main.py --method regex --watch inbox/ --workers 4
 """
 
 import argparse
+import json
+import signal
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import fitz
+
 from src.InvoiceExtractors import (
     RegexInvoiceExtractor,
     LLMInvoiceExtractor,
     LayoutInvoiceExtractor,
+    SharedOCRPass,
 )
+from src.ResultSinks import open_result_sink, RecordBuffer
+from src.Dedup import DedupStore, summarize_dedup_stats
+from src.OCRProcessor import OCRProcessor
+from src.ResourceScheduler import ResourceScheduler, WORKER
+from src.Deadline import Deadline, STAGE_COSTS, summarize_deadlines
+from src.LLMBatching import LLMInvoiceBatcher
+from src.WatchFolder import WatchFolder
 from openai import OpenAI
 import os
 
-def run_regex_pipeline(pdf_path: str, output_dir: str):
-    extractor = RegexInvoiceExtractor(Path(pdf_path), Path(output_dir))
+def start_deadline(options):
+    """Start the per-document clock when the document is picked up."""
+    if options.get("deadline"):
+        options["deadline"] = Deadline(options["deadline"])
+    return options
+
+
+def run_regex_pipeline(pdf_path: str, output_dir: str, **options):
+    start_deadline(options)
+    extractor = RegexInvoiceExtractor(Path(pdf_path), Path(output_dir), **options)
     extractor.extract()
+    return extractor
 
 
-def run_llm_pipeline(pdf_path: str, output_dir: str):
-    client = OpenAI(
-        base_url="https://api.groq.com/openai/v1",
-        api_key=os.getenv('GROQ_API_KEY'),  # replace with your key or use env-var
-    )
-    model = "deepseek-r1-distill-llama-70b"
-    system_prompt = """You are an invoice-extraction engine.
+LLM_MODEL = "deepseek-r1-distill-llama-70b"
+LLM_SYSTEM_PROMPT = """You are an invoice-extraction engine.
                     Return ONLY valid JSON with this schema:
                     {
                     "supplier": { "name": str, "vat": str },
@@ -44,15 +84,253 @@ def run_llm_pipeline(pdf_path: str, output_dir: str):
                                             "vat": float,
                                             "total": float
                                             }}"""
+
+
+def llm_settings():
+    """(client, model, system prompt) shared by the single and batched LLM modes."""
+    client = OpenAI(
+        base_url="https://api.groq.com/openai/v1",
+        api_key=os.getenv('GROQ_API_KEY'),  # replace with your key or use env-var
+    )
+    return client, LLM_MODEL, LLM_SYSTEM_PROMPT
+
+
+def run_llm_pipeline(pdf_path: str, output_dir: str, **options):
+    start_deadline(options)
+    client, model, system_prompt = llm_settings()
     extractor = LLMInvoiceExtractor(
-        Path(pdf_path), Path(output_dir), client, model, system_prompt
+        Path(pdf_path), Path(output_dir), client, model, system_prompt, **options
     )
     extractor.extract()
+    return extractor
+
+
+def run_llm_batched(pdf_paths, output_dir: str, token_budget: int, **options):
+    """OCR every PDF, then pack short invoices into shared LLM requests."""
+    client, model, system_prompt = llm_settings()
+    batcher = LLMInvoiceBatcher(client, model, system_prompt, token_budget=token_budget)
+    for pdf_path in pdf_paths:
+        extractor = LLMInvoiceExtractor(
+            Path(pdf_path), Path(output_dir), client, model, system_prompt, **options
+        )
+        if extractor.prepare():
+            batcher.add(extractor)
+    batcher.close()
+    return batcher.report()
 
 
-def run_layout_pipeline(pdf_path: str, output_dir: str):
-    extractor = LayoutInvoiceExtractor(Path(pdf_path), Path(output_dir))
+def run_layout_pipeline(pdf_path: str, output_dir: str, **options):
+    start_deadline(options)
+    extractor = LayoutInvoiceExtractor(
+        Path(pdf_path),
+        Path(output_dir),
+        ocr_processor=options.get("ocr_processor"),
+        layout_model=options.get("layout_model"),
+        deadline=options.get("deadline"),
+    )
     extractor.extract()
+    return extractor
+
+
+def run_all_pipeline(pdf_path: str, output_dir: str, **options):
+    """Render + OCR the PDF once, then run every method on it concurrently.
+
+    Outputs go to <output_dir>/<method>/<stem>/ (the shared OCR artefacts to
+    <output_dir>/ocr/<stem>/). Returns the shared pass; its timings hold the
+    OCR seconds and each method's seconds after OCR.
+    """
+    start = time.time()
+    pdf_path, output_dir = Path(pdf_path), Path(output_dir)
+    shared = SharedOCRPass(
+        pdf_path,
+        output_dir / "ocr",
+        reading_order=options.get("reading_order"),
+        dedup=options.get("dedup"),
+        ocr_processor=options.get("ocr_processor"),
+    ).run()
+
+    # The sink belongs to this thread; the method threads fill a buffer
+    sink = options.get("sink")
+    records = RecordBuffer() if sink is not None else None
+    common = {
+        "sink": records,
+        "reading_order": options.get("reading_order"),
+        "dedup": options.get("dedup"),
+        "ocr_processor": shared.ocr_processor,
+        "shared_ocr": shared,
+    }
+    client, model, system_prompt = llm_settings()
+    extractors = {
+        "regex": RegexInvoiceExtractor(pdf_path, output_dir / "regex", **common),
+        "llm": LLMInvoiceExtractor(
+            pdf_path, output_dir / "llm", client, model, system_prompt, **common
+        ),
+        "layout": LayoutInvoiceExtractor(
+            pdf_path,
+            output_dir / "layout",
+            ocr_processor=shared.ocr_processor,
+            layout_model=options.get("layout_model"),
+            shared_ocr=shared,
+        ),
+    }
+
+    errors = {}
+
+    def timed(name, extractor):
+        # One failing method (e.g. the LLM endpoint) must not cost the others
+        method_start = time.time()
+        try:
+            extractor.extract()
+        except Exception as e:
+            errors[name] = f"{type(e).__name__}: {e}"
+            print(f"❌ {name} failed on {pdf_path.name}: {errors[name]}")
+        return round(time.time() - method_start, 3)
+
+    with ThreadPoolExecutor(max_workers=len(extractors)) as pool:
+        futures = {name: pool.submit(timed, name, e) for name, e in extractors.items()}
+        shared.timings["methods"] = {name: f.result() for name, f in futures.items()}
+    shared.timings["errors"] = errors
+    if records is not None:
+        records.replay(sink)
+
+    shared.renders.clear()
+    shared.timings["total_sec"] = round(time.time() - start, 3)
+    print(
+        f"🔀 {pdf_path.name}: OCR {shared.timings['ocr_sec']}s once, then "
+        + ", ".join(f"{k} {v}s" for k, v in shared.timings["methods"].items())
+    )
+    return shared
+
+
+def compare_methods(output_dir: Path, ground_truths: Path, documents, wall_sec: float):
+    """Side-by-side accuracy (InvoiceEvaluator) and latency of `--method all`.
+
+    *documents* are the per-PDF timings of `run_all_pipeline`. The separate
+    runs estimate counts the OCR pass once per method, as three runs would.
+    """
+    from evaluation import InvoiceEvaluator
+
+    ocr_sec = [d["ocr_sec"] for d in documents]
+    report = {"num_pdfs": len(documents), "ocr_sec_total": round(sum(ocr_sec), 2)}
+    methods = {}
+    for name in ("regex", "llm", "layout"):
+        method_dir = output_dir / name
+        secs = [d["methods"][name] for d in documents]
+        row = {
+            "latency_p50_sec": round(statistics.median(secs), 3),
+            "latency_mean_sec": round(statistics.fmean(secs), 3),
+            # what a separate `--method <name>` run would have spent per PDF
+            "standalone_mean_sec": round(
+                statistics.fmean(o + s for o, s in zip(ocr_sec, secs)), 3
+            ),
+            "failed": sum(name in (d.get("errors") or {}) for d in documents),
+        }
+        if ground_truths.is_dir() and any(method_dir.glob("*/invoice.json")):
+            evaluator = InvoiceEvaluator(ground_truths, method_dir)
+            evaluator.evaluate()
+            summary, _ = evaluator.report()
+            row.update(summary)
+        methods[name] = row
+    report["methods"] = methods
+    separate = sum(
+        3 * d["ocr_sec"] + sum(d["methods"].values()) for d in documents
+    )
+    report.update(
+        {
+            "wall_sec": round(wall_sec, 2),
+            "separate_runs_est_sec": round(separate, 2),
+            "speedup": round(separate / wall_sec, 2) if wall_sec else None,
+        }
+    )
+    (output_dir / "comparison.json").write_text(json.dumps(report, indent=2))
+
+    print("\n=== 🔀 Method comparison ===")
+    print(f"{'':8}{'PO %':>8}{'Items %':>9}{'Totals %':>10}{'p50 s':>8}{'alone s':>9}")
+    for name, row in methods.items():
+        accuracy = [
+            row.get(k)
+            for k in (
+                "PO Accuracy (%)",
+                "Line-item Accuracy (%)",
+                "Total-fields Accuracy (%)",
+            )
+        ]
+        acc = "".join(
+            f"{a:>{w}.2f}" if a is not None else f"{'–':>{w}}"
+            for a, w in zip(accuracy, (8, 9, 10))
+        )
+        print(
+            f"{name:8}{acc}{row['latency_p50_sec']:8.2f}{row['standalone_mean_sec']:9.2f}"
+        )
+    print(
+        f"Wall clock {report['wall_sec']}s vs ~{report['separate_runs_est_sec']}s "
+        f"for three separate runs"
+    )
+    return report
+
+
+METHOD_DISPATCH = {
+    "regex": run_regex_pipeline,
+    "llm": run_llm_pipeline,
+    "layout": run_layout_pipeline,
+    "all": run_all_pipeline,
+}
+
+
+# ── Parallel mode: one pinned worker process per core slice ──────────
+def init_pipeline_worker(
+    spec, method, options, sink_path, dedup_path, ocr_kwargs, sink_batch_size=None
+):
+    """Load models once per worker, sized to the cores the scheduler gave it.
+
+    sink_batch_size – rows a worker's sink buffers before writing them
+    """
+    from multiprocessing.util import Finalize
+
+    # Ctrl-C goes to the whole process group: the parent decides what stops,
+    # and a worker killed mid-document would break the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    options = dict(options)
+    # Initial stage estimates of the run (e.g. --llm-estimate-sec)
+    STAGE_COSTS.estimates.update(options.pop("stage_costs", {}))
+    options["ocr_processor"] = OCRProcessor(
+        cpu_threads=spec["ocr_threads"], **ocr_kwargs
+    )
+    if method in ("layout", "all"):
+        from src.Layout import LayoutLvm3
+
+        options["layout_model"] = LayoutLvm3(num_threads=spec["layout_threads"])
+    # Sinks and dedup stores are per-process handles; flush them on worker exit
+    if sink_path:
+        options["sink"] = open_result_sink(Path(sink_path), sink_batch_size)
+        Finalize(options["sink"], options["sink"].close, exitpriority=10)
+    if dedup_path:
+        options["dedup"] = DedupStore(Path(dedup_path))
+        Finalize(options["dedup"], options["dedup"].close, exitpriority=10)
+    WORKER["method"] = method
+    WORKER["options"] = options
+
+
+def run_pipeline_task(pdf_path: str, output_dir: Path):
+    start = time.time()
+    extractor = METHOD_DISPATCH[WORKER["method"]](
+        pdf_path, output_dir, **WORKER["options"]
+    )
+    dedup = WORKER["options"].get("dedup")
+    with fitz.open(pdf_path) as doc:
+        pages = len(doc)
+    return {
+        "pdf": str(pdf_path),
+        "pages": pages,
+        "elapsed_sec": round(time.time() - start, 2),
+        "worker": WORKER["spec"]["worker"],
+        "pid": os.getpid(),
+        "dedup": dict(dedup.stats) if dedup else None,
+        "deadline": extractor.timings.get("deadline"),
+        "ocr_sec": extractor.timings.get("ocr_sec"),
+        "methods": extractor.timings.get("methods"),
+        "errors": extractor.timings.get("errors"),
+    }
 
 
 if __name__ == "__main__":
@@ -60,29 +338,278 @@ if __name__ == "__main__":
     parser.add_argument(
         "--method",
         required=True,
-        choices=["regex", "llm", "layout"],
-        help="Extraction method",
+        choices=["regex", "llm", "layout", "all"],
+        help="Extraction method (all = one OCR pass shared by every method)",
     )
-    parser.add_argument(
-        "--pdf", required=True, type=str, help="Path to the invoice PDF"
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument(
+        "--pdf",
+        type=str,
+        help="Path to the invoice PDF, or a directory of PDFs",
+    )
+    source.add_argument(
+        "--watch",
+        type=str,
+        help="Run as a daemon: extract PDFs as they are dropped into this directory",
     )
     parser.add_argument("--out", default="outputs", type=str, help="Output directory")
+    parser.add_argument(
+        "--sink",
+        default=None,
+        type=str,
+        help="Also append results to a bulk sink (.jsonl, .parquet or .sqlite)",
+    )
+    parser.add_argument(
+        "--reading-order",
+        default=None,
+        choices=["rows", "columns"],
+        help="Rebuild page text from OCR box geometry (default: OCR line order)",
+    )
+    parser.add_argument(
+        "--dedup-store",
+        default=None,
+        type=str,
+        help="SQLite store used to reuse OCR/results of duplicate pages and PDFs",
+    )
+    parser.add_argument(
+        "--lazy-ocr",
+        action="store_true",
+        help="Regex only: OCR pages on demand and stop after the totals footer",
+    )
+    parser.add_argument(
+        "--workers",
+        default=1,
+        type=int,
+        help="Parallel worker processes (0 = calibrate the best workers × threads split)",
+    )
+    parser.add_argument(
+        "--threads", default=None, type=int, help="Cores per worker (default: even split)"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="LLM only: stream the completion and emit fields as they complete",
+    )
+    parser.add_argument(
+        "--llm-batch-tokens",
+        default=None,
+        type=int,
+        help="LLM only: pack short invoices into one request up to this many prompt tokens",
+    )
+    parser.add_argument(
+        "--two-pass-ocr",
+        action="store_true",
+        help="OCR at 150 DPI, re-read only low-confidence/malformed-amount lines at 300 DPI",
+    )
+    parser.add_argument(
+        "--preprocess",
+        action="store_true",
+        help="Grayscale, crop margins and deskew pages before OCR",
+    )
+    parser.add_argument(
+        "--binarize",
+        action="store_true",
+        help="With --preprocess: also binarize pages (Otsu threshold)",
+    )
+    parser.add_argument(
+        "--deadline",
+        default=None,
+        type=float,
+        help="Per-invoice time budget in seconds; lower DPI, skip pages, "
+        "fall back LLM→regex or skip LayoutLMv3 to meet it",
+    )
+    parser.add_argument(
+        "--llm-estimate-sec",
+        default=None,
+        type=float,
+        help="With --deadline: initial estimate of one LLM call, used to keep "
+        f"time for it when planning OCR (default {STAGE_COSTS.DEFAULTS['llm']})",
+    )
+    parser.add_argument(
+        "--ground-truths",
+        default="ground_truths",
+        type=str,
+        help="With --method all: ground truths for the side-by-side accuracy report",
+    )
+    parser.add_argument(
+        "--poll-sec",
+        default=2.0,
+        type=float,
+        help="With --watch: seconds between scans of the drop directory",
+    )
 
     args = parser.parse_args()
-    pdf_path   = Path(args.pdf).expanduser().resolve()
-    file_stem  = pdf_path.stem 
-    
     output_dir = Path(args.out) / args.method
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    if not Path(args.pdf).exists():
-        raise FileNotFoundError(f"PDF file not found: {args.pdf}")
+    if args.watch:
+        if not Path(args.watch).is_dir():
+            raise FileNotFoundError(f"Watch directory not found: {args.watch}")
+        if args.workers == 0 or args.llm_batch_tokens:
+            parser.error("--watch needs a fixed --workers count, without --llm-batch-tokens")
+        pdf_paths = []
+    else:
+        if not Path(args.pdf).exists():
+            raise FileNotFoundError(f"PDF file not found: {args.pdf}")
+        pdf_paths = (
+            sorted(Path(args.pdf).glob("*.pdf")) if Path(args.pdf).is_dir() else [args.pdf]
+        )
+    options = {"reading_order": args.reading_order, "deadline": args.deadline}
+    if args.lazy_ocr:
+        if args.method != "regex":
+            parser.error("--lazy-ocr is only supported with --method regex")
+        options["lazy_ocr"] = True
+    if args.stream:
+        if args.method != "llm":
+            parser.error("--stream is only supported with --method llm")
+        options["stream"] = True
+    if args.llm_batch_tokens:
+        if args.method != "llm" or args.stream or args.deadline:
+            parser.error("--llm-batch-tokens needs --method llm, without --stream/--deadline")
+        if args.workers != 1 or args.threads:
+            parser.error("--llm-batch-tokens runs in a single process")
+    if args.method == "all" and args.deadline:
+        parser.error("--deadline is not supported with --method all")
+    if args.llm_estimate_sec and not args.deadline:
+        parser.error("--llm-estimate-sec needs --deadline")
+    stage_costs = {"llm": args.llm_estimate_sec} if args.llm_estimate_sec else {}
+    STAGE_COSTS.estimates.update(stage_costs)
 
-    method_dispatch = {
-        "regex": run_regex_pipeline,
-        "llm": run_llm_pipeline,
-        "layout": run_layout_pipeline,
-    }
+    if args.binarize and not args.preprocess:
+        parser.error("--binarize needs --preprocess")
+    ocr_kwargs = {"two_pass": True} if args.two_pass_ocr else {}
+    if args.preprocess:
+        ocr_kwargs.update({"preprocess": True, "binarize": args.binarize})
+
+    run_start = time.time()
+    run_report = {"method": args.method, "num_pdfs": len(pdf_paths)}
+    dedup_stats = None
+    deadline_reports = []
+
+    if args.watch:
+        # ── Daemon: a bounded pool of pinned workers fed from the drop directory
+        scheduler = ResourceScheduler(
+            layout=args.method in ("layout", "all")
+        )
+        topology = scheduler.plan(args.workers, args.threads)
+        print(
+            f"🧮 {topology['workers']} workers × {topology['threads_per_worker']} "
+            f"threads on {topology['cores']} cores ({topology['source']})"
+        )
+        # batch_size=1: a file's rows are written before it is moved to done/
+        initargs = (
+            args.method,
+            {**options, "stage_costs": stage_costs},
+            args.sink,
+            args.dedup_store,
+            ocr_kwargs,
+            1,
+        )
+        with scheduler.executor(topology, init_pipeline_worker, initargs) as pool:
+            watcher = WatchFolder(
+                Path(args.watch),
+                pool,
+                run_pipeline_task,
+                output_dir,
+                max_in_flight=2 * topology["workers"],
+                poll_sec=args.poll_sec,
+            )
+            run_report["watch"] = watcher.run()
+        run_report["topology"] = topology
+    elif args.workers == 1 and args.threads is None:
+        # ── Sequential (single process, libraries pick their own threads)
+        sink = open_result_sink(Path(args.sink)) if args.sink else None
+        dedup = DedupStore(Path(args.dedup_store)) if args.dedup_store else None
+        options.update({"sink": sink, "dedup": dedup})
+        # Load the models before any document's clock (or deadline) starts
+        options["ocr_processor"] = OCRProcessor(**ocr_kwargs)
+        if args.method in ("layout", "all"):
+            from src.Layout import LayoutLvm3
+
+            options["layout_model"] = LayoutLvm3()
+        try:
+            if args.llm_batch_tokens:
+                run_report["llm_batching"] = run_llm_batched(
+                    pdf_paths, output_dir, args.llm_batch_tokens, **options
+                )
+                print(
+                    f"📦 {run_report['llm_batching']['tokens_per_invoice']} tokens/invoice, "
+                    f"{run_report['llm_batching']['invoices_per_min']} invoices/min"
+                )
+            else:
+                documents = []
+                for pdf in pdf_paths:
+                    extractor = METHOD_DISPATCH[args.method](pdf, output_dir, **options)
+                    deadline_reports.append(extractor.timings.get("deadline"))
+                    documents.append(
+                        {
+                            "ocr_sec": extractor.timings.get("ocr_sec"),
+                            "methods": extractor.timings.get("methods"),
+                            "errors": extractor.timings.get("errors"),
+                        }
+                    )
+        finally:
+            if sink is not None:
+                sink.close()
+            if dedup is not None:
+                dedup_stats = dedup.stats
+                dedup.close()
+        run_report["topology"] = {"workers": 1, "source": "sequential"}
+    else:
+        # ── Parallel: the scheduler owns the core budget
+        scheduler = ResourceScheduler(
+            layout=args.method in ("layout", "all")
+        )
+        topology = (
+            scheduler.calibrate(pdf_paths, ocr_kwargs=ocr_kwargs)
+            if args.workers == 0
+            else scheduler.plan(args.workers, args.threads)
+        )
+        print(
+            f"🧮 {topology['workers']} workers × {topology['threads_per_worker']} "
+            f"threads on {topology['cores']} cores ({topology['source']})"
+        )
+        initargs = (
+            args.method,
+            {**options, "stage_costs": stage_costs},
+            args.sink,
+            args.dedup_store,
+            ocr_kwargs,
+        )
+        with scheduler.executor(topology, init_pipeline_worker, initargs) as pool:
+            futures = [
+                pool.submit(run_pipeline_task, pdf, output_dir) for pdf in pdf_paths
+            ]
+            documents = [f.result() for f in futures]
+
+        # Each worker reports cumulative dedup counters; keep its latest snapshot
+        if args.dedup_store and documents:
+            latest = {d["pid"]: d["dedup"] for d in documents}
+            dedup_stats = {
+                k: sum(s[k] for s in latest.values()) for k in next(iter(latest.values()))
+            }
+        pages = sum(d["pages"] for d in documents)
+        deadline_reports = [d["deadline"] for d in documents]
+        run_report.update({"topology": topology, "num_pages": pages, "documents": documents})
+
+    wall = time.time() - run_start
+    run_report["wall_sec"] = round(wall, 2)
+    if args.deadline:
+        run_report["deadline"] = summarize_deadlines(deadline_reports)
+    if run_report.get("num_pages"):
+        run_report["pages_per_sec"] = round(run_report["num_pages"] / wall, 3)
+    if args.method == "all" and pdf_paths:
+        run_report["comparison"] = compare_methods(
+            output_dir, Path(args.ground_truths), documents, wall
+        )
+    (output_dir / "run_report.json").write_text(json.dumps(run_report, indent=2))
 
-    method_dispatch[args.method](args.pdf, output_dir)
+    if dedup_stats is not None:
+        report = summarize_dedup_stats(dedup_stats)
+        (output_dir / "dedup_report.json").write_text(json.dumps(report, indent=2))
+        print(
+            f"♻️ Dedup: {report['page_hit_rate']:.0%} pages, "
+            f"{report['document_hit_rate']:.0%} documents reused, "
+            f"{report['ocr_sec_saved']}s OCR saved"
+        )
 
@@ -0,0 +1,169 @@
+import time
+from typing import List, Dict, Any, Sequence, Tuple
+
+import numpy as np
+
+
+class StageCosts:
+    """Running estimates of how long each pipeline stage takes.
+
+    Estimates start from conservative CPU defaults and are refined with an
+    exponential moving average as documents are processed, so later
+    documents of a run plan with the timings of the machine they run on.
+    OCR is tracked per page at `ref_dpi`; other DPIs scale with pixel count.
+    """
+
+    DEFAULTS = {"ocr_page": 2.0, "llm": 6.0, "layout_page": 1.5}
+
+    def __init__(self, alpha: float = 0.3, ref_dpi: int = 300, **defaults: float):
+        self.alpha = alpha
+        self.ref_dpi = ref_dpi
+        self.estimates: Dict[str, float] = {**self.DEFAULTS, **defaults}
+
+    def estimate(self, stage: str, dpi: int = None) -> float:
+        sec = self.estimates[stage]
+        if dpi and stage == "ocr_page":
+            sec *= (dpi / self.ref_dpi) ** 2
+        return sec
+
+    def observe(self, stage: str, seconds: float, dpi: int = None) -> None:
+        if dpi and stage == "ocr_page":
+            seconds /= (dpi / self.ref_dpi) ** 2
+        prev = self.estimates.get(stage, seconds)
+        self.estimates[stage] = (1 - self.alpha) * prev + self.alpha * seconds
+
+
+#: Shared by every document of a process, so estimates carry over
+STAGE_COSTS = StageCosts()
+
+
+class Deadline:
+    """Per-document time budget and the degradations taken to meet it.
+
+    The clock starts when the document is picked up. Stages ask the deadline
+    what they can still afford and, when they cut quality to stay in budget,
+    log it through `degrade()` so the output says exactly what was skipped.
+
+    Degradation ladder, cheapest first:
+      lower_dpi        – render at 200 then 150 DPI instead of the default
+      first_last_pages – OCR only the first and last page (header + totals)
+      llm_to_regex     – no time left for an LLM call, use the regex rules
+      skip_layoutlmv3  – OCR boxes only, no LayoutLMv3 token classification
+    """
+
+    DPI_LADDER = (300, 200, 150)
+
+    def __init__(
+        self, budget_sec: float, costs: StageCosts = None, margin: float = 0.1
+    ):
+        """
+        margin – fraction of the budget kept in reserve for writing outputs
+                 and estimate errors
+        """
+        self.budget_sec = budget_sec
+        self.costs = costs or STAGE_COSTS
+        self.margin = margin
+        self.start = time.monotonic()
+        self.degradations: List[Dict[str, Any]] = []
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def remaining(self) -> float:
+        """Seconds left before the safety margin is reached."""
+        return self.budget_sec * (1 - self.margin) - self.elapsed()
+
+    def affords(
+        self, stage: str, units: int = 1, reserve: float = 0.0, dpi: int = None
+    ) -> bool:
+        """*dpi* scales the OCR estimate (see `StageCosts.estimate`)."""
+        return self.costs.estimate(stage, dpi) * units + reserve <= self.remaining()
+
+    def degrade(self, step: str, **details: Any) -> None:
+        self.degradations.append(
+            {
+                "step": step,
+                "at_sec": round(self.elapsed(), 3),
+                "remaining_sec": round(self.remaining(), 3),
+                **details,
+            }
+        )
+        print(f"⏳ Deadline: {step} {details or ''}".rstrip())
+
+    def applied(self, step: str) -> bool:
+        return any(d["step"] == step for d in self.degradations)
+
+    # ── OCR planning ──────────────────────────────────────────────────
+    def choose_dpi(self, num_pages: int, dpi: int, reserve: float = 0.0) -> int:
+        """Highest DPI of the ladder at which *num_pages* fit the budget."""
+        available = self.remaining() - reserve
+        ladder = [dpi] + [d for d in self.DPI_LADDER if d < dpi]
+        for chosen in ladder:
+            if num_pages * self.costs.estimate("ocr_page", chosen) <= available:
+                break
+        if chosen != dpi:
+            self.degrade("lower_dpi", dpi=chosen, from_dpi=dpi)
+        return chosen
+
+    def plan_ocr(
+        self, num_pages: int, dpi: int, reserve: float = 0.0
+    ) -> Tuple[int, List[int]]:
+        """Pick (dpi, 1-based pages to OCR) that fit the budget.
+
+        *reserve* is the time later stages (LLM call, LayoutLMv3) still need.
+        """
+        pages = list(range(1, num_pages + 1))
+        chosen = self.choose_dpi(num_pages, dpi, reserve)
+        cost = num_pages * self.costs.estimate("ocr_page", chosen)
+        if num_pages > 2 and cost > self.remaining() - reserve:
+            pages = [1, num_pages]
+            self.degrade("first_last_pages", pages=pages, num_pages=num_pages)
+        return chosen, pages
+
+    def trim_pages(
+        self, pages: Sequence[int], done: int, dpi: int, reserve: float = 0.0
+    ) -> List[int]:
+        """Mid-document check: jump straight to the last page when the pages
+        still queued no longer fit (e.g. OCR ran slower than estimated)."""
+        todo = list(pages[done:])
+        if len(todo) <= 1 or self.applied("first_last_pages"):
+            return list(pages)
+        cost = self.costs.estimate("ocr_page", dpi)
+        if cost * len(todo) + reserve <= self.remaining():
+            return list(pages)
+        self.degrade(
+            "first_last_pages", pages=list(pages[:done]) + todo[-1:], num_pages=len(pages)
+        )
+        return list(pages[:done]) + todo[-1:]
+
+    def report(self) -> Dict[str, Any]:
+        elapsed = self.elapsed()
+        return {
+            "budget_sec": self.budget_sec,
+            "elapsed_sec": round(elapsed, 3),
+            "met": elapsed <= self.budget_sec,
+            "degradations": self.degradations,
+        }
+
+
+def summarize_deadlines(reports: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Latency distribution and degradation counts over many `Deadline.report()`s."""
+    reports = [r for r in reports if r]
+    if not reports:
+        return {"documents": 0}
+    latency = np.array([r["elapsed_sec"] for r in reports])
+    steps: Dict[str, int] = {}
+    for r in reports:
+        for step in {d["step"] for d in r["degradations"]}:
+            steps[step] = steps.get(step, 0) + 1
+    return {
+        "documents": len(reports),
+        "budget_sec": reports[0]["budget_sec"],
+        "met_rate": round(sum(r["met"] for r in reports) / len(reports), 4),
+        "p50_sec": round(float(np.percentile(latency, 50)), 3),
+        "p90_sec": round(float(np.percentile(latency, 90)), 3),
+        "p99_sec": round(float(np.percentile(latency, 99)), 3),
+        "max_sec": round(float(latency.max()), 3),
+        "degraded_documents": sum(bool(r["degradations"]) for r in reports),
+        "degradations": steps,
+    }
@@ -0,0 +1,219 @@
+import json
+import zlib
+import sqlite3
+import threading
+import hashlib
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+# ----------------- Hashing ---------------------------
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Exact content hash of a PDF, used for whole-document dedup."""
+    h = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def page_thumbnail(img: Image.Image, factor: int = 8) -> np.ndarray:
+    """Downscaled grayscale render used for hashing and match verification."""
+    return np.asarray(img.convert("L").reduce(factor), dtype=np.uint8)
+
+
+def dhash(thumb: np.ndarray, hash_size: int = 16) -> str:
+    """Difference hash (hash_size² bits) of a grayscale thumbnail, as hex."""
+    small = np.asarray(
+        Image.fromarray(thumb).resize((hash_size + 1, hash_size), Image.BILINEAR),
+        dtype=np.int16,
+    )
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return np.packbits(bits).tobytes().hex()
+
+
+def summarize_dedup_stats(stats: Dict[str, float]) -> Dict[str, float]:
+    """Add hit rates to raw DedupStore counters (possibly summed over workers)."""
+    pages = stats["page_hits"] + stats["page_misses"]
+    docs = stats["document_hits"] + stats["document_misses"]
+    return {
+        **stats,
+        "ocr_sec_saved": round(stats["ocr_sec_saved"], 2),
+        "page_hit_rate": round(stats["page_hits"] / pages, 4) if pages else 0.0,
+        "document_hit_rate": round(stats["document_hits"] / docs, 4) if docs else 0.0,
+    }
+
+
+# ----------------- Store -----------------------------
+class DedupStore:
+    """Hash-indexed cache of OCR output per page and extraction per document.
+
+    Pages are keyed by a perceptual hash of the downscaled render; a candidate
+    is only reused when its stored thumbnail matches pixel for pixel (within
+    *pixel_tol*), so two invoices that share a template but differ in a few
+    digits are never confused.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS pages (
+            id      INTEGER PRIMARY KEY AUTOINCREMENT,
+            phash   TEXT NOT NULL,
+            options TEXT NOT NULL,
+            width   INTEGER,
+            height  INTEGER,
+            thumb   BLOB,
+            ocr     TEXT,
+            stats   TEXT,
+            ocr_sec REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_pages_phash ON pages(phash, options);
+        CREATE TABLE IF NOT EXISTS documents (
+            sha256  TEXT NOT NULL,
+            method  TEXT NOT NULL,
+            options TEXT NOT NULL,
+            result  TEXT,
+            ocr_sec REAL,
+            PRIMARY KEY (sha256, method, options)
+        );
+    """
+
+    def __init__(self, path: Path, pixel_tol: int = 48, max_outliers: float = 5e-4):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.pixel_tol = pixel_tol
+        self.max_outliers = max_outliers
+        # Parallel workers share the file, so wait on locks instead of failing
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        # ... and `--method all` shares one store between its method threads
+        self._lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        for table in ("pages", "documents"):
+            columns = [r[1] for r in self.conn.execute(f"PRAGMA table_info({table})")]
+            if columns and "options" not in columns:
+                # Entries of older stores don't say which settings produced them
+                self.conn.execute(f"DROP TABLE {table}")
+        self.conn.executescript(self._SCHEMA)
+        self.stats: Dict[str, float] = {
+            "page_hits": 0,
+            "page_misses": 0,
+            "document_hits": 0,
+            "document_misses": 0,
+            "ocr_sec_saved": 0.0,
+        }
+
+    def _same_page(self, a: np.ndarray, b: np.ndarray) -> bool:
+        if a.shape != b.shape:
+            return False
+        diff = np.abs(a.astype(np.int16) - b.astype(np.int16))
+        return np.count_nonzero(diff > self.pixel_tol) <= self.max_outliers * a.size
+
+    # ── pages ─────────────────────────────────────────────────────────
+    def lookup_page(
+        self, img: Image.Image, options: Dict[str, Any] = None
+    ) -> Tuple[Optional[Tuple[tuple, float, Dict[str, Any]]], str, np.ndarray]:
+        """Look up a page OCR'd before with the same OCR *options*.
+
+        Returns ((run_ocr_arrays output, OCR seconds, page stats) or None,
+        phash, thumbnail).
+        """
+        thumb = page_thumbnail(img)
+        key = dhash(thumb)
+        rows = self.conn.execute(
+            "SELECT height, width, thumb, ocr, stats, ocr_sec FROM pages "
+            "WHERE phash = ? AND options = ?",
+            (key, self.options_key(options)),
+        ).fetchall()
+        for height, width, blob, ocr, stats, ocr_sec in rows:
+            stored = np.frombuffer(zlib.decompress(blob), dtype=np.uint8)
+            if stored.size != thumb.size or (height, width) != img.size[::-1]:
+                continue
+            if self._same_page(stored.reshape(thumb.shape), thumb):
+                self.stats["page_hits"] += 1
+                self.stats["ocr_sec_saved"] += ocr_sec or 0.0
+                hit = (tuple(json.loads(ocr)), ocr_sec or 0.0, json.loads(stats or "{}"))
+                return hit, key, thumb
+        self.stats["page_misses"] += 1
+        return None, key, thumb
+
+    def add_page(
+        self,
+        img: Image.Image,
+        ocr: Tuple[str, List[float], List[List[float]], List[str]],
+        ocr_sec: float,
+        key: str = None,
+        thumb: np.ndarray = None,
+        options: Dict[str, Any] = None,
+        stats: Dict[str, Any] = None,
+    ) -> None:
+        """stats – per-page OCR stats (two-pass, preprocessing) to replay on a hit"""
+        thumb = page_thumbnail(img) if thumb is None else thumb
+        key = dhash(thumb) if key is None else key
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO pages "
+                "(phash, options, width, height, thumb, ocr, stats, ocr_sec) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    self.options_key(options),
+                    img.size[0],
+                    img.size[1],
+                    zlib.compress(thumb.tobytes()),
+                    json.dumps(ocr, default=float),
+                    json.dumps(stats or {}, default=float),
+                    ocr_sec,
+                ),
+            )
+
+    # ── documents ─────────────────────────────────────────────────────
+    @staticmethod
+    def options_key(options: Dict[str, Any]) -> str:
+        return json.dumps(options or {}, sort_keys=True, default=str)
+
+    def lookup_document(
+        self, sha256: str, method: str, options: Dict[str, Any] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Outputs of *sha256* extracted by *method* with the same *options*."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT result, ocr_sec FROM documents "
+                "WHERE sha256 = ? AND method = ? AND options = ?",
+                (sha256, method, self.options_key(options)),
+            ).fetchone()
+            if row is None:
+                self.stats["document_misses"] += 1
+                return None
+            self.stats["document_hits"] += 1
+            self.stats["ocr_sec_saved"] += row[1] or 0.0
+        return json.loads(row[0])
+
+    def add_document(
+        self,
+        sha256: str,
+        method: str,
+        options: Dict[str, Any],
+        result: Dict[str, Any],
+        ocr_sec: float,
+    ) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents "
+                "(sha256, method, options, result, ocr_sec) VALUES (?, ?, ?, ?, ?)",
+                (
+                    sha256,
+                    method,
+                    self.options_key(options),
+                    json.dumps(result, ensure_ascii=False),
+                    ocr_sec,
+                ),
+            )
+
+    # ── reporting ─────────────────────────────────────────────────────
+    def report(self) -> Dict[str, float]:
+        return summarize_dedup_stats(self.stats)
+
+    def close(self) -> None:
+        self.conn.close()
@@ -3,151 +3,666 @@ import json
 from pathlib import Path
 import statistics
 from src.OCRProcessor import OCRProcessor
-from typing import List, Dict, Any
+import fitz
+import numpy as np
+from typing import List, Dict, Any, Callable, Tuple
 from src.Layout import LayoutLvm3
-import re
+from src.ResultSinks import BaseResultSink, make_record
+from src.SpatialIndex import PageSpatialIndex
+from src.Dedup import DedupStore, file_sha256
+from src.OCRLayout import DocumentLayout, PageLayout
+from src.Deadline import Deadline
 
 
 class BaseInvoiceExtractor:
-    def __init__(self, pdf_path: Path, output_dir: Path):
+    method = ""
+
+    def __init__(
+        self,
+        pdf_path: Path,
+        output_dir: Path,
+        sink: BaseResultSink = None,
+        reading_order: str = None,
+        dedup: DedupStore = None,
+        ocr_processor: OCRProcessor = None,
+        deadline: Deadline = None,
+        shared_ocr: "SharedOCRPass" = None,
+    ):
+        """
+        reading_order – None keeps PaddleOCR's line order; "rows" or "columns"
+                        rebuilds each page's text from its spatial index
+        dedup         – reuse OCR/extraction results of already seen pages/PDFs
+        ocr_processor – shared, already loaded OCR engine (e.g. one per worker)
+        deadline      – per-document time budget; stages degrade to meet it
+        shared_ocr    – finished OCR pass of the same PDF to take pages from
+                        instead of rendering and OCR'ing them again
+        """
         self.pdf_path = pdf_path
+        self.sink = sink
+        self.reading_order = reading_order
+        self.dedup = dedup
+        self.deadline = deadline
+        self.shared_ocr = shared_ocr
+        self.pdf_sha256 = ""
 
         pdf_name = pdf_path.stem
         self.output_dir = output_dir / pdf_name
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
-        self.ocr_processor = OCRProcessor()
+        self.ocr_processor = ocr_processor or OCRProcessor()
+        self.ocr_dpi = self.ocr_processor.render_dpi
         self.pages_text: List[str] = []
         self.all_scores: List[float] = []
         self.stats: Dict[str, Any] = {}
-        self.layout_data: List[Dict[str, Any]] = []
+        self.layout_data = DocumentLayout()
+        self.page_indexes: Dict[int, PageSpatialIndex] = {}
+        self.pages_reused = 0
+        self.ocr_sec_saved = 0.0
+        self.timings: Dict[str, float] = {}
+        self.outputs: Dict[str, Any] = {}
+
+    def write_json(self, rel_path: str, payload: Any):
+        """Write a JSON output under output_dir and remember it for dedup replay."""
+        path = self.output_dir / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(payload, indent=2, ensure_ascii=False))
+        self.outputs[rel_path] = payload
+
+    # ── Whole-document dedup (exact PDF bytes) ────────────────────────
+    def extraction_options(self) -> Dict[str, Any]:
+        """Settings that change the outputs; part of the document dedup key."""
+        return {"reading_order": self.reading_order, **self.ocr_processor.options()}
+
+    def reuse_document(self) -> bool:
+        """Replay the outputs of an identical, already processed PDF."""
+        if self.dedup is None:
+            return False
+        self.pdf_sha256 = file_sha256(self.pdf_path)
+        cached = self.dedup.lookup_document(
+            self.pdf_sha256, self.method, self.extraction_options()
+        )
+        if cached is None:
+            return False
+        start_time = time.time()
+        for rel_path, payload in cached.items():
+            self.write_json(rel_path, payload)
+        self.stats = cached.get("ocr_stats.json", {})
+        self.timings["total_sec"] = round(time.time() - start_time, 3)
+        self.timings["reused"] = True
+        parts = sorted(k for k in cached if k.startswith("invoices/"))
+        if parts:
+            for k, rel_path in enumerate(parts, start=1):
+                self.record_result(cached[rel_path], part=k)
+        elif "invoice.json" in cached:
+            self.record_result(cached["invoice.json"], usage=cached.get("usage.json"))
+        print(f"♻️ Duplicate of an already processed PDF — reused {len(cached)} outputs")
+        return True
+
+    def remember_document(self):
+        # A result degraded to meet a deadline must not be replayed as final
+        if self.dedup is None or (self.deadline and self.deadline.degradations):
+            return
+        self.dedup.add_document(
+            self.pdf_sha256,
+            self.method,
+            self.extraction_options(),
+            self.outputs,
+            self.timings.get("ocr_sec"),
+        )
 
     # ── OCR phase (saves text files, images, layout_input.json) ──────
-    def save_ocr_results(self):
-        base_out = self.output_dir
-        pages_dir = base_out / "pages"
-        texts_dir = base_out / "texts"
+    def save_ocr_results(self, reserve: float = 0.0):
+        """OCR every page, or under a deadline the pages/DPI it can afford.
+
+        reserve – seconds the stages after OCR still need (e.g. the LLM call)
+        """
+        if self.shared_ocr is not None:
+            return self.use_shared_ocr()
+        ocr_start = time.time()
+        with fitz.open(self.pdf_path) as doc:
+            pages = list(range(1, len(doc) + 1))
+            if self.deadline:
+                self.ocr_dpi, pages = self.deadline.plan_ocr(
+                    len(doc), self.ocr_dpi, reserve
+                )
+            done = 0
+            while done < len(pages):
+                if self.deadline:
+                    pages = self.deadline.trim_pages(pages, done, self.ocr_dpi, reserve)
+                self.pages_text.append(self.ocr_pdf_page(doc, pages[done]))
+                done += 1
+        self.write_ocr_stats()
+        self.timings["ocr_sec"] = round(time.time() - ocr_start, 3)
+
+    def use_shared_ocr(self):
+        """Take page texts, layout and OCR stats from `self.shared_ocr`."""
+        shared = self.shared_ocr
+        self.ocr_dpi = shared.ocr_dpi
+        self.pages_text = list(shared.pages_text)
+        self.all_scores = list(shared.all_scores)
+        self.layout_data = shared.layout_data
+        self.page_indexes = shared.page_indexes
+        self.pages_reused = shared.pages_reused
+        self.ocr_sec_saved = shared.ocr_sec_saved
+        self.stats = dict(shared.stats, shared_ocr=str(shared.output_dir))
+        self.write_json("ocr_stats.json", self.stats)
+        self.timings["ocr_sec"] = shared.timings["ocr_sec"]
+
+    def ocr_pdf_page(self, doc: fitz.Document, idx: int) -> str:
+        """Render page *idx* (1-based) at the current DPI and OCR it."""
+        page_start = time.time()
+        reused = self.pages_reused
+        page = doc[idx - 1]
+        img = self.ocr_processor.render_page(page, self.ocr_dpi)
+        text = self.ocr_page(idx, img, page)
+        if self.deadline and self.pages_reused == reused:
+            self.deadline.costs.observe(
+                "ocr_page", time.time() - page_start, self.ocr_dpi
+            )
+        return text
+
+    def ocr_page(self, idx: int, img, page: fitz.Page = None) -> str:
+        """OCR one rendered page, save its artefacts and return its text.
+
+        page – PDF page *img* was rendered from (used by two-pass OCR)
+        """
+        pages_dir = self.output_dir / "pages"
+        texts_dir = self.output_dir / "texts"
         pages_dir.mkdir(parents=True, exist_ok=True)
         texts_dir.mkdir(parents=True, exist_ok=True)
 
-        for idx, img in enumerate(
-            self.ocr_processor.pdf_to_images(self.pdf_path), start=1
-        ):
-            # ----- Save resized image
-            method = str(self.output_dir).split("/")[-2]
-            if method == "layout":
-                img = img.resize((762, 1000))
-
-            img.save(pages_dir / f"page{idx}.png")
-            # ----- OCR
-            text, scores, boxes = self.ocr_processor.run_ocr(img)
-            (texts_dir / f"page{idx}.txt").write_text(text, encoding="utf8")
-
-            # ----- Stats per page
-            mean_conf = round(statistics.fmean(scores) * 100, 2) if scores else 0.0
-            stdev_conf = (
-                round(statistics.stdev(scores) * 100, 2) if len(scores) > 1 else 0.0
-            )
-            self.stats[f"page_{idx}"] = {
-                "mean_conf": mean_conf,
-                "stdev_conf": stdev_conf,
-            }
+        # ----- Save resized image
+        method = str(self.output_dir).split("/")[-2]
+        if method == "layout":
+            img = img.resize((762, 1000))
 
-            self.pages_text.append(text)
-            self.all_scores.extend(scores)
-
-            # ----- Layout info per line
-            for b, t, s in zip(boxes, text.split("\n"), scores):
-                self.layout_data.append(
-                    {
-                        "page": idx,
-                        "text": t,
-                        "score": round(s, 3),
-                        "box": b,
-                    }
+        img.save(pages_dir / f"page{idx}.png")
+        # ----- OCR (skipped for pages already recognised before)
+        ocr_options = self.ocr_processor.options()
+        hit, key, thumb = (
+            self.dedup.lookup_page(img, ocr_options) if self.dedup else (None, None, None)
+        )
+        if hit:
+            (text, scores, boxes, lines), saved, page_stats = hit
+            scores = np.asarray(scores, dtype=np.float32)
+            boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+            self.pages_reused += 1
+            self.ocr_sec_saved += saved
+        else:
+            page_start = time.time()
+            refined = dict(self.ocr_processor.refine_stats)
+            text, scores, boxes, lines = self.ocr_processor.run_ocr_arrays(img, page)
+            page_stats = {}
+            if self.ocr_processor.two_pass:
+                for k in ("rechecked", "replaced"):
+                    page_stats[f"{k}_lines"] = (
+                        self.ocr_processor.refine_stats[k] - refined[k]
+                    )
+            if self.ocr_processor.preprocessor:
+                page_stats["preprocess"] = self.ocr_processor.last_preprocess
+            if self.dedup:
+                self.dedup.add_page(
+                    img,
+                    (text, scores.tolist(), boxes.tolist(), lines),
+                    time.time() - page_start,
+                    key,
+                    thumb,
+                    options=ocr_options,
+                    stats=page_stats,
                 )
+        if self.reading_order:
+            index = PageSpatialIndex(lines, boxes)
+            self.page_indexes[idx] = index
+            text = index.reading_order_text(self.reading_order)
+        (texts_dir / f"page{idx}.txt").write_text(text, encoding="utf8")
+
+        # ----- Stats per page
+        scores_list = scores.tolist()
+        mean_conf = (
+            round(statistics.fmean(scores_list) * 100, 2) if scores_list else 0.0
+        )
+        stdev_conf = (
+            round(statistics.stdev(scores_list) * 100, 2)
+            if len(scores_list) > 1
+            else 0.0
+        )
+        self.stats[f"page_{idx}"] = {
+            "mean_conf": mean_conf,
+            "stdev_conf": stdev_conf,
+            **page_stats,  # two-pass / preprocessing, replayed for reused pages
+        }
+        self.all_scores.extend(scores_list)
 
-            print(f"✓ OCR Page {idx}: {mean_conf}% mean confidence")
+        # ----- Layout info per line (columnar, see OCRLayout)
+        self.layout_data.append(PageLayout.from_ocr(idx, lines, scores, boxes))
 
+        reused = " (reused)" if hit else ""
+        print(f"✓ OCR Page {idx}: {mean_conf}% mean confidence{reused}")
+        return text
+
+    def page_index(self, idx: int) -> PageSpatialIndex:
+        """Spatial index of OCR'd page *idx* (1-based), built on first use."""
+        if idx not in self.page_indexes:
+            page = self.layout_data.page(idx)
+            self.page_indexes[idx] = PageSpatialIndex(page.texts, page.boxes)
+        return self.page_indexes[idx]
+
+    def write_ocr_stats(self):
         # ----- Global stats
         if self.all_scores:
             self.stats["overall_mean_conf"] = round(
                 statistics.fmean(self.all_scores) * 100, 2
             )
-            self.stats["overall_stdev_conf"] = round(
-                statistics.stdev(self.all_scores) * 100, 2
+            self.stats["overall_stdev_conf"] = (
+                round(statistics.stdev(self.all_scores) * 100, 2)
+                if len(self.all_scores) > 1
+                else 0.0
             )
         else:
             self.stats["overall_mean_conf"] = self.stats["overall_stdev_conf"] = 0.0
 
-        (base_out / "ocr_stats.json").write_text(json.dumps(self.stats, indent=2))
+        if self.dedup is not None:
+            pages_seen = sum(1 for k in self.stats if k.startswith("page_"))
+            self.stats["dedup"] = {
+                "pages_reused": self.pages_reused,
+                "pages_ocred": pages_seen - self.pages_reused,
+                "ocr_sec_saved": round(self.ocr_sec_saved, 2),
+            }
+
+        self.write_json("ocr_stats.json", self.stats)
+
+    def record_deadline(self):
+        """Write deadline.json (budget, latency, degradations applied)."""
+        if self.deadline is None:
+            return
+        self.timings["deadline"] = self.deadline.report()
+        self.write_json("deadline.json", self.timings["deadline"])
+
+    # ── Bulk sink (optional, in addition to the per-invoice JSON files) ──
+    def record_result(
+        self, result: Dict[str, Any], usage: Dict[str, Any] = None, part: int = 0
+    ):
+        if self.sink is None:
+            return
+        self.sink.add(
+            make_record(
+                self.pdf_path.stem,
+                self.method,
+                result,
+                usage=usage,
+                ocr_stats=self.stats,
+                timings=self.timings,
+                part=part,
+            )
+        )
+
+
+class LazyPages:
+    """Page texts of a PDF, rendered and OCR'd only when first accessed.
+
+    Holds the PDF open until `close()` (or the end of a ``with`` block).
+    """
+
+    def __init__(self, extractor: BaseInvoiceExtractor):
+        self.extractor = extractor
+        self.doc = fitz.open(extractor.pdf_path)
+        self.texts: Dict[int, str] = {}
+
+    def close(self) -> None:
+        self.doc.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.doc)
+
+    def __getitem__(self, idx: int) -> str:
+        """Text of page *idx* (0-based, negative indices allowed)."""
+        idx = range(len(self))[idx]
+        if idx not in self.texts:
+            self.texts[idx] = self.extractor.ocr_pdf_page(self.doc, idx + 1)
+        return self.texts[idx]
+
+    def scan_until(self, done, start: int = 0) -> List[str]:
+        """OCR pages from *start* onwards until done(text_so_far) is true."""
+        pages = []
+        for idx in range(start, len(self)):
+            pages.append(self[idx])
+            if done("\n".join(pages)):
+                break
+        return pages
+
+    def report(self) -> Dict[str, Any]:
+        ocred = sorted(i + 1 for i in self.texts)
+        return {
+            "pages_total": len(self),
+            "pages_ocred": len(ocred),
+            "pages_skipped": len(self) - len(ocred),
+            "ocred": ocred,
+        }
+
+
+class SharedOCRPass(BaseInvoiceExtractor):
+    """A single render + OCR pass of a PDF, shared by several methods.
+
+    Page images, texts and ocr_stats.json are written once under
+    <output_dir>/<stem>/. `renders` keeps every page image, already resized
+    to the LayoutLMv3 input size, so layout can work from the same render
+    instead of rendering the page again; `render_sizes` holds the size each
+    page was rendered (and OCR'd) at.
+    """
+
+    method = "ocr"
+
+    def __init__(
+        self,
+        pdf_path: Path,
+        output_dir: Path,
+        reading_order: str = None,
+        dedup: DedupStore = None,
+        ocr_processor: OCRProcessor = None,
+    ):
+        super().__init__(
+            pdf_path,
+            output_dir,
+            reading_order=reading_order,
+            dedup=dedup,
+            ocr_processor=ocr_processor,
+        )
+        self.renders: Dict[int, Any] = {}
+        self.render_sizes: Dict[int, Tuple[int, int]] = {}
+
+    def ocr_page(self, idx: int, img, page: fitz.Page = None) -> str:
+        # A full-resolution page is ~25 MB at 300 DPI; layout only needs this
+        self.renders[idx] = img.resize(LayoutInvoiceExtractor.input_size)
+        self.render_sizes[idx] = img.size
+        return super().ocr_page(idx, img, page)
+
+    def run(self) -> "SharedOCRPass":
+        self.save_ocr_results()
+        return self
 
 
 class RegexInvoiceExtractor(BaseInvoiceExtractor):
-    def __init__(self, pdf_path: Path, output_dir: Path):
-        super().__init__(pdf_path, output_dir)
+    method = "regex"
+
+    def __init__(
+        self,
+        pdf_path: Path,
+        output_dir: Path,
+        sink: BaseResultSink = None,
+        reading_order: str = None,
+        dedup: DedupStore = None,
+        lazy_ocr: bool = False,
+        ocr_processor: OCRProcessor = None,
+        deadline: Deadline = None,
+        shared_ocr: SharedOCRPass = None,
+    ):
+        """
+        lazy_ocr – OCR page 1, then scan forward only until the subtotal/total
+                   footer is found; trailing annex pages are never OCR'd
+                   (multi-invoice splitting needs every page and is skipped)
+        """
+        super().__init__(
+            pdf_path,
+            output_dir,
+            sink,
+            reading_order,
+            dedup,
+            ocr_processor,
+            deadline,
+            shared_ocr,
+        )
+        self.lazy_ocr = lazy_ocr
+
+    def extraction_options(self) -> Dict[str, Any]:
+        return {**super().extraction_options(), "lazy_ocr": self.lazy_ocr}
+
+    def _extract_lazy(self, start_time: float):
+        from src.regex_extraction_helpers import PATTERNS, extract_invoice
+
+        def totals_found(text: str) -> bool:
+            m_sub = PATTERNS["subtotal"].search(text)
+            return bool(m_sub and PATTERNS["total"].search(text, m_sub.end()))
+
+        def out_of_time(text: str) -> bool:
+            # Keep enough budget for the last page, where the totals usually are
+            return self.deadline is not None and not self.deadline.affords(
+                "ocr_page", 2, dpi=self.ocr_dpi
+            )
+
+        ocr_start = time.time()
+        with LazyPages(self) as pages:
+            if self.deadline and len(pages):
+                self.ocr_dpi = self.deadline.choose_dpi(len(pages), self.ocr_dpi)
+            # Page 1 carries supplier + header; items run until the totals footer
+            self.pages_text = (
+                pages.scan_until(lambda t: totals_found(t) or out_of_time(t))
+                if len(pages)
+                else []
+            )
+            if (
+                self.deadline
+                and len(pages) - 1 not in pages.texts
+                and not totals_found("\n".join(self.pages_text))
+            ):
+                self.deadline.degrade(
+                    "first_last_pages", pages=[1, len(pages)], num_pages=len(pages)
+                )
+                self.pages_text.append(pages[-1])
+            self.stats["lazy_ocr"] = pages.report()
+        self.write_ocr_stats()
+        self.timings["ocr_sec"] = round(time.time() - ocr_start, 3)
+
+        result = extract_invoice(self.pages_text)
+        self.write_json("invoice.json", result)
+        self.timings["total_sec"] = round(time.time() - start_time, 3)
+        self.record_deadline()
+        self.record_result(result)
+        self.remember_document()
+        lazy = self.stats["lazy_ocr"]
+        print(
+            f"🏁 Extraction complete in {round(time.time() - start_time, 2)}s "
+            f"(OCR'd {lazy['pages_ocred']}/{lazy['pages_total']} pages)"
+        )
 
     def extract(self):
         start_time = time.time()
+        if self.reuse_document():
+            return
+        if self.lazy_ocr:
+            return self._extract_lazy(start_time)
         self.save_ocr_results()
-        combined_text = "\n".join(self.pages_text)
 
-        from src.regex_extraction_helpers import (
-            extract_supplier_info,
-            extract_header_fields,
-            extract_line_items,
-            extract_totals,
-        )
+        from src.regex_extraction_helpers import extract_invoice
+        from src.invoice_splitter import split_invoices
 
-        m_global_po = re.search(
-            r"\bPONUMBER[:\s]*PO[-\s]*(?P<po>\d{4,10})\b", combined_text, re.IGNORECASE
+        # Splitting needs every page; a first+last page OCR is one invoice
+        partial = self.deadline is not None and self.deadline.applied(
+            "first_last_pages"
         )
-        general_po = f"PO-{m_global_po.group('po')}" if m_global_po else ""
-
-        first_page_text = self.pages_text[0] if self.pages_text else ""
-        supplier_info = extract_supplier_info(first_page_text)
-        header_fields = extract_header_fields(combined_text)
-        items = extract_line_items(combined_text, general_po)
-        totals = extract_totals(combined_text)
+        segments = [] if partial else split_invoices(self.pages_text)
+        if len(segments) <= 1:
+            result = extract_invoice(self.pages_text)
+            self.write_json("invoice.json", result)
+            self.timings["total_sec"] = round(time.time() - start_time, 3)
+            self.record_deadline()
+            self.record_result(result)
+            self.remember_document()
+            print(f"🏁 Extraction complete in {round(time.time() - start_time, 2)}s")
+            return
+
+        # ----- Several invoices in one PDF: extract each one independently
+        segment_texts = [
+            [self.pages_text[p - 1] for p in seg["pages"]] for seg in segments
+        ]
+        # A few ms per segment: cheaper in-process than spawning a pool, and
+        # safe under --method all, where this runs on a thread
+        results = [extract_invoice(texts) for texts in segment_texts]
+
+        report = []
+        for k, (seg, result) in enumerate(zip(segments, results), start=1):
+            out_name = f"invoices/invoice_{k:02d}.json"
+            self.write_json(out_name, result)
+            report.append(
+                {
+                    "output": out_name,
+                    "pages": seg["pages"],
+                    "invoice_no": result.get("invoice_no") or seg["invoice_no"],
+                    "reasons": seg["reasons"],
+                    "num_items": len(result.get("items", [])),
+                }
+            )
 
-        result = {
-            "supplier": supplier_info,
-            "invoice_no": header_fields.get("invoice_no", ""),
-            "date": header_fields.get("date", ""),
-            "items": items,
-            "totals": totals,
-        }
-        (self.output_dir / "invoice.json").write_text(
-            json.dumps(result, indent=2, ensure_ascii=False)
+        self.write_json(
+            "split_report.json", {"num_pages": len(self.pages_text), "invoices": report}
+        )
+        self.timings["total_sec"] = round(time.time() - start_time, 3)
+        self.record_deadline()
+        for k, result in enumerate(results, start=1):
+            self.record_result(result, part=k)
+        self.remember_document()
+        print(
+            f"🏁 Split into {len(segments)} invoices, extraction complete in "
+            f"{round(time.time() - start_time, 2)}s"
         )
-        print(f"🏁 Extraction complete in {round(time.time() - start_time, 2)}s")
 
 
 class LLMInvoiceExtractor(BaseInvoiceExtractor):
+    method = "llm"
+    #: Shortest request worth sending under a deadline (seconds)
+    min_llm_sec = 0.5
+
     def __init__(
-        self, pdf_path: Path, output_dir: Path, llm_client, model: str, sys_prompt: str
+        self,
+        pdf_path: Path,
+        output_dir: Path,
+        llm_client,
+        model: str,
+        sys_prompt: str,
+        sink: BaseResultSink = None,
+        reading_order: str = None,
+        dedup: DedupStore = None,
+        ocr_processor: OCRProcessor = None,
+        deadline: Deadline = None,
+        stream: bool = False,
+        on_event: Callable[[str, Any], None] = None,
+        shared_ocr: SharedOCRPass = None,
     ):
-        super().__init__(pdf_path, output_dir)
+        """
+        stream   – consume the completion as a token stream, parse the JSON
+                   incrementally and re-ask as soon as it leaves the schema
+        on_event – called with (kind, data) for the supplier, header, each
+                   line item and the totals as soon as they are complete
+        """
+        super().__init__(
+            pdf_path,
+            output_dir,
+            sink,
+            reading_order,
+            dedup,
+            ocr_processor,
+            deadline,
+            shared_ocr,
+        )
         self.client = llm_client
         self.model = model
         self.sys_prompt = sys_prompt
-
-    def extract(self):
-        start_time = time.time()
-        self.save_ocr_results()
+        self.stream = stream
+        self.on_event = on_event
+
+    def extraction_options(self) -> Dict[str, Any]:
+        return {**super().extraction_options(), "model": self.model}
+
+    def regex_fallback(self, reason: str) -> Dict[str, Any]:
+        """Deadline fallback: extract with the regex rules from the OCR text."""
+        from src.regex_extraction_helpers import extract_invoice
+
+        self.deadline.degrade("llm_to_regex", reason=reason)
+        return extract_invoice(self.pages_text)
+
+    def prepare(self) -> bool:
+        """OCR the PDF and build the chat messages; False for a reused duplicate."""
+        self.start_time = time.time()
+        self.doc_key = self.pdf_path.stem
+        if self.reuse_document():
+            return False
+        deadline = self.deadline
+        self.save_ocr_results(reserve=deadline.costs.estimate("llm") if deadline else 0.0)
         combined_text = "\n".join(
             f"=== Page {i+1} ===\n{text}" for i, text in enumerate(self.pages_text)
         )
+        self.messages = [
+            {"role": "system", "content": self.sys_prompt},
+            {"role": "user", "content": combined_text},
+        ]
+        return True
+
+    def extract(self):
+        if not self.prepare():
+            return
+        deadline = self.deadline
+        complete = self.complete_streaming if self.stream else self.complete_blocking
+        usage: Dict[str, Any] = {}
+        # The request is capped at the remaining budget, so try it whenever
+        # there is time for one: a stale "llm" estimate must not rule it out
+        if deadline and deadline.remaining() < self.min_llm_sec:
+            result = self.regex_fallback("no budget left for the LLM call")
+        else:
+            llm_start = time.time()
+            try:
+                result, usage = complete(self.messages)
+            except Exception as e:  # timeout, transport error or schema divergence
+                if deadline is None:
+                    raise
+                # A timed-out call took at least this long: still worth learning
+                deadline.costs.observe("llm", time.time() - llm_start)
+                result = self.regex_fallback(f"LLM call failed: {type(e).__name__}")
+            else:
+                if deadline:
+                    deadline.costs.observe("llm", time.time() - llm_start)
+        self.finish(result, usage)
+
+    def finish(self, result: Dict[str, Any], usage: Dict[str, Any]):
+        """Write invoice.json/usage.json and record the result."""
+        start_time, deadline = self.start_time, self.deadline
+        self.write_json("invoice.json", result)
+
+        usage.update(
+            {"model": self.model, "elapsed_sec": round(time.time() - start_time, 2)}
+        )
+        if deadline and deadline.applied("llm_to_regex"):
+            usage["fallback"] = "regex"
+        self.write_json("usage.json", usage)
+        self.timings["total_sec"] = round(time.time() - start_time, 3)
+        self.record_deadline()
+        self.record_result(result, usage=usage)
+        self.remember_document()
+
+        print(
+            f"🏁 Done in {usage['elapsed_sec']}s | prompt={usage.get('prompt_tokens','?')}, completion={usage.get('completion_tokens','?')} tokens"
+        )
+
+    def _request_options(self) -> Dict[str, Any]:
+        # Under a deadline the request may not outlive the budget
+        if self.deadline:
+            return {"timeout": max(self.deadline.remaining(), self.min_llm_sec)}
+        return {}
+
+    def complete_blocking(self, messages: List[Dict[str, str]]):
+        """Wait for the whole completion, then parse it. Returns (result, usage)."""
 
         def call_llm():
             return self.client.chat.completions.create(
                 model=self.model,
                 response_format={"type": "json_object"},
                 temperature=0,
-                messages=[
-                    {"role": "system", "content": self.sys_prompt},
-                    {"role": "user", "content": combined_text},
-                ],
+                messages=messages,
+                **self._request_options(),
             )
 
         response = call_llm()
@@ -155,54 +670,138 @@ class LLMInvoiceExtractor(BaseInvoiceExtractor):
 
         # Re-ask if response is suspiciously short
         if usage and usage.get("completion_tokens", 0) < usage.get("prompt_tokens", 0):
-            print("⚠️ Output tokens shorter than input — retrying once...")
-            response = call_llm()
-            usage = response.usage.model_dump() if response.usage else {}
-
-        result = json.loads(response.choices[0].message.content)
-        (self.output_dir / "invoice.json").write_text(
-            json.dumps(result, indent=2, ensure_ascii=False)
-        )
-
-        usage.update(
-            {"model": self.model, "elapsed_sec": round(time.time() - start_time, 2)}
-        )
-        (self.output_dir / "usage.json").write_text(json.dumps(usage, indent=2))
-
-        print(
-            f"🏁 Done in {usage['elapsed_sec']}s | prompt={usage.get('prompt_tokens','?')}, completion={usage.get('completion_tokens','?')} tokens"
+            if self.deadline and not self.deadline.affords("llm"):
+                self.deadline.degrade("skip_llm_retry")
+            else:
+                print("⚠️ Output tokens shorter than input — retrying once...")
+                response = call_llm()
+                usage = response.usage.model_dump() if response.usage else {}
+
+        return json.loads(response.choices[0].message.content), usage
+
+    def complete_streaming(self, messages: List[Dict[str, str]]):
+        """Stream the completion, emitting fields as they complete.
+
+        Every event is also appended to stream_events.jsonl with its offset
+        from the request start, so downstream readers can tail the file.
+        """
+        from src.LLMStreaming import stream_invoice
+
+        events_path = self.output_dir / "stream_events.jsonl"
+        events_path.unlink(missing_ok=True)
+        start = time.time()
+
+        def on_event(kind: str, data: Any):
+            with events_path.open("a", encoding="utf-8") as f:
+                event = {"t": round(time.time() - start, 3), "event": kind, "data": data}
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+            print(f"📨 {kind} ({round(time.time() - start, 2)}s)")
+            if self.on_event is not None:
+                self.on_event(kind, data)
+
+        result, usage, stats = stream_invoice(
+            self.client,
+            self.model,
+            messages,
+            on_event=on_event,
+            **self._request_options(),
         )
+        usage["stream"] = stats
+        return result, usage
 
 
 class LayoutInvoiceExtractor(BaseInvoiceExtractor):
+    method = "layout"
+    #: LayoutLMv3 input size (pages are resized to it before inference)
+    input_size = (762, 1000)
+
     def __init__(
         self,
         pdf_path: Path,
         output_dir: Path,
         model_name="nielsr/layoutlmv3-finetuned-funsd",
+        ocr_processor: OCRProcessor = None,
+        layout_model: LayoutLvm3 = None,
+        deadline: Deadline = None,
+        shared_ocr: SharedOCRPass = None,
     ):
-        super().__init__(pdf_path, output_dir)
-        self.layout_model = LayoutLvm3(model_name=model_name)
+        super().__init__(
+            pdf_path,
+            output_dir,
+            ocr_processor=ocr_processor,
+            deadline=deadline,
+            shared_ocr=shared_ocr,
+        )
+        self.layout_model = layout_model or LayoutLvm3(model_name=model_name)
 
-    def extract(self):
-        start_time = time.time()
-        self.output_dir.mkdir(parents=True, exist_ok=True)
+    def layout_page(self, page_idx: int, img, lines: List[str], boxes) -> None:
+        """Run LayoutLMv3 on one resized page and save the annotated image."""
+        layout_start = time.time()
+        predictions, processed_boxes = self.layout_model.infer(img, lines, boxes)
+        if self.deadline:
+            self.deadline.costs.observe("layout_page", time.time() - layout_start)
 
-        for page_idx, img in enumerate(
-            self.ocr_processor.pdf_to_images(self.pdf_path), start=1
-        ):
-            img = img.resize((762, 1000))
-            text, scores, boxes = self.ocr_processor.run_ocr(img)
-            lines = text.split("\n")
+        annotated = self.layout_model.draw(
+            img.copy(), lines, processed_boxes, predictions
+        )
+        annotated.save(self.output_dir / f"page{page_idx}_layout.png")
 
-            predictions, processed_boxes = self.layout_model.infer(img, lines, boxes)
+        print(f"✓ Page {page_idx}: Layout processed")
 
-            annotated = self.layout_model.draw(
-                img.copy(), lines, processed_boxes, predictions
+    def _extract_shared(self):
+        """Layout from the shared pass: its resized renders, rescaled boxes."""
+        shared = self.shared_ocr
+        for page_idx, img in shared.renders.items():
+            page = shared.layout_data.page(page_idx)
+            scale = np.array(self.input_size * 2, dtype=np.float32) / np.array(
+                shared.render_sizes[page_idx] * 2, dtype=np.float32
             )
-            annotated.save(self.output_dir / f"page{page_idx}_layout.png")
+            boxes = np.rint(page.boxes * scale).astype(int).tolist()
+            self.layout_page(page_idx, img, page.texts, boxes)
+        self.timings["ocr_sec"] = shared.timings["ocr_sec"]
 
-            print(f"✓ Page {page_idx}: Layout processed")
+    def extract(self):
+        start_time = time.time()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        deadline = self.deadline
+        skipped = []
 
+        if self.shared_ocr is not None:
+            self._extract_shared()
+        else:
+            with fitz.open(self.pdf_path) as doc:
+                pages = list(range(1, len(doc) + 1))
+                reserve = deadline.costs.estimate("layout_page") if deadline else 0.0
+                if deadline:
+                    # Pages are resized to 762×1000 anyway, so DPI only costs render time
+                    self.ocr_dpi, pages = deadline.plan_ocr(
+                        len(doc), self.ocr_dpi, reserve * len(doc)
+                    )
+                done = 0
+                while done < len(pages):
+                    if deadline:
+                        pages = deadline.trim_pages(pages, done, self.ocr_dpi, reserve)
+                    page_idx = pages[done]
+                    done += 1
+                    # Decide before rendering: a skipped page costs nothing
+                    if deadline and not deadline.affords(
+                        "layout_page",
+                        reserve=deadline.costs.estimate("ocr_page", self.ocr_dpi),
+                    ):
+                        skipped.append(page_idx)
+                        continue
+
+                    img = self.ocr_processor.render_page(doc[page_idx - 1], self.ocr_dpi)
+                    img = img.resize(self.input_size)
+                    _, _, boxes, lines = self.ocr_processor.run_ocr_arrays(
+                        img, doc[page_idx - 1]
+                    )
+                    boxes = np.rint(boxes).astype(int).tolist()
+                    self.layout_page(page_idx, img, lines, boxes)
+
+        if skipped:
+            deadline.degrade("skip_layoutlmv3", pages=skipped)
+        self.timings["total_sec"] = round(time.time() - start_time, 3)
+        self.record_deadline()
         elapsed = round(time.time() - start_time, 2)
         print(f"🏁 Layout-based extraction complete in {elapsed}s")
@@ -0,0 +1,172 @@
+import json
+import math
+import time
+from typing import List, Dict, Any
+
+from src.LLMStreaming import SchemaDivergence, validate_invoice
+
+BATCH_INSTRUCTIONS = """
+You will receive several invoices in one message. Each one is enclosed in
+<<<DOC id=ID>>> ... <<<END DOC>>> markers. Extract every invoice separately,
+with the schema above, and return ONLY valid JSON of the form:
+{ "invoices": [ { "doc_id": "ID", "invoice": { ...schema... } }, ... ] }
+with exactly one entry per document id."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (≈ 4 characters per token) used for packing."""
+    return math.ceil(len(text) / 4)
+
+
+class LLMInvoiceBatcher:
+    """Pack several short invoices into one chat completion.
+
+    Documents are buffered with `add()` until the next one would push the
+    request past *token_budget* prompt tokens (or *max_docs*), then sent as a
+    single request. The answer is split back into per-invoice results; any
+    entry that is missing or fails schema validation is re-sent on its own.
+
+    Each job needs ``doc_key``, ``messages`` ([system, user]),
+    ``complete_blocking(messages)`` and ``finish(result, usage)``, which is
+    what a prepared `LLMInvoiceExtractor` provides.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        sys_prompt: str,
+        token_budget: int = 6000,
+        max_docs: int = 10,
+    ):
+        self.client = client
+        self.model = model
+        self.sys_prompt = sys_prompt.rstrip() + "\n" + BATCH_INSTRUCTIONS
+        self.token_budget = token_budget
+        self.max_docs = max_docs
+        self._pending: List[Any] = []
+        self._pending_tokens = estimate_tokens(self.sys_prompt)
+        self.stats: Dict[str, Any] = {
+            "requests": 0,
+            "batched_requests": 0,
+            "invoices": 0,
+            "fallbacks": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "llm_sec": 0.0,
+        }
+
+    # ── packing ─────────────────────────────────────────────────────
+    def add(self, job) -> None:
+        tokens = estimate_tokens(job.messages[1]["content"])
+        if self._pending and (
+            self._pending_tokens + tokens > self.token_budget
+            or len(self._pending) >= self.max_docs
+        ):
+            self.flush()
+        self._pending.append(job)
+        self._pending_tokens += tokens
+
+    def flush(self) -> None:
+        jobs, self._pending = self._pending, []
+        self._pending_tokens = estimate_tokens(self.sys_prompt)
+        if len(jobs) == 1:
+            self._single(jobs[0])
+        elif jobs:
+            self._batch(jobs)
+
+    def close(self) -> None:
+        self.flush()
+
+    # ── requests ───────────────────────────────────────────────────
+    def _count(self, usage: Dict[str, Any], elapsed: float) -> None:
+        self.stats["requests"] += 1
+        self.stats["prompt_tokens"] += usage.get("prompt_tokens", 0)
+        self.stats["completion_tokens"] += usage.get("completion_tokens", 0)
+        self.stats["llm_sec"] += elapsed
+
+    def _single(self, job, reason: str = None) -> None:
+        start = time.time()
+        result, usage = job.complete_blocking(job.messages)
+        self._count(usage, time.time() - start)
+        self.stats["invoices"] += 1
+        if reason:
+            self.stats["fallbacks"] += 1
+            usage["batch"] = {"fallback": reason}
+        job.finish(result, usage)
+
+    def _batch(self, jobs: List[Any]) -> None:
+        ids = [f"D{i}" for i in range(1, len(jobs) + 1)]
+        content = "\n\n".join(
+            f"<<<DOC id={doc_id}>>>\n{job.messages[1]['content']}\n<<<END DOC>>>"
+            for doc_id, job in zip(ids, jobs)
+        )
+        start = time.time()
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                response_format={"type": "json_object"},
+                temperature=0,
+                messages=[
+                    {"role": "system", "content": self.sys_prompt},
+                    {"role": "user", "content": content},
+                ],
+            )
+        except Exception as e:  # e.g. context length exceeded, timeout
+            reason = f"batched request failed: {type(e).__name__}: {e}"
+            print(f"⚠️ {reason} — re-sending {len(jobs)} invoices one by one")
+            for job in jobs:
+                self._single(job, reason=reason)
+            return
+        usage = response.usage.model_dump() if response.usage else {}
+        self._count(usage, time.time() - start)
+        self.stats["batched_requests"] += 1
+        print(f"📦 Batched {len(jobs)} invoices in one request")
+
+        try:
+            entries = json.loads(response.choices[0].message.content)["invoices"]
+            by_id = {e["doc_id"]: e["invoice"] for e in entries if isinstance(e, dict)}
+        except (json.JSONDecodeError, KeyError, TypeError):
+            by_id = {}
+
+        # Split the request's tokens by each document's share of it
+        doc_tokens = [estimate_tokens(job.messages[1]["content"]) for job in jobs]
+        out_chars = [len(json.dumps(by_id.get(i, ""))) for i in ids]
+        for doc_id, job, tokens, chars in zip(ids, jobs, doc_tokens, out_chars):
+            result = by_id.get(doc_id)
+            try:
+                if result is None:
+                    raise SchemaDivergence(doc_id, "missing from the batched answer")
+                validate_invoice(result)
+            except SchemaDivergence as e:
+                print(f"⚠️ {job.doc_key}: {e} — re-sending on its own")
+                self._single(job, reason=str(e))
+                continue
+            self.stats["invoices"] += 1
+            job.finish(
+                result,
+                {
+                    "prompt_tokens": round(
+                        usage.get("prompt_tokens", 0) * tokens / sum(doc_tokens)
+                    ),
+                    "completion_tokens": round(
+                        usage.get("completion_tokens", 0) * chars / (sum(out_chars) or 1)
+                    ),
+                    "batch": {"doc_id": doc_id, "size": len(jobs)},
+                },
+            )
+
+    # ── reporting ──────────────────────────────────────────────────
+    def report(self) -> Dict[str, Any]:
+        s = self.stats
+        n = s["invoices"] or 1
+        return {
+            **s,
+            "llm_sec": round(s["llm_sec"], 2),
+            "tokens_per_invoice": round(
+                (s["prompt_tokens"] + s["completion_tokens"]) / n, 1
+            ),
+            "invoices_per_min": round(s["invoices"] / s["llm_sec"] * 60, 2)
+            if s["llm_sec"]
+            else 0.0,
+        }
@@ -0,0 +1,406 @@
+import json
+import math
+import time
+from typing import List, Dict, Any, Callable, Tuple
+
+
+class SchemaDivergence(ValueError):
+    """The streamed JSON left the invoice schema (bad type, unknown key, …)."""
+
+    def __init__(self, path: str, reason: str):
+        super().__init__(f"{path}: {reason}")
+        self.path = path
+        self.reason = reason
+
+
+# ----------------- Incremental JSON -------------------
+class IncrementalJSONParser:
+    """Scan a JSON object chunk by chunk, without re-parsing what came before.
+
+    `feed()` returns ``("field", key, value)`` as soon as a top-level member is
+    complete and ``("item", key, index, value)`` for every complete element of
+    the arrays named in *stream_arrays*. A top-level key outside
+    *allowed_keys* raises `SchemaDivergence` as soon as the key is read.
+    Text before the opening brace,
+    including a ``<think>…</think>`` reasoning block, is skipped.
+    """
+
+    _THINK_OPEN, _THINK_CLOSE = "<think>", "</think>"
+
+    def __init__(self, stream_arrays=("items",), allowed_keys=None):
+        self.stream_arrays = set(stream_arrays)
+        self.allowed_keys = set(allowed_keys) if allowed_keys else None
+        self.buf = ""
+        self.pos = 0
+        self.stack: List[Dict[str, Any]] = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+        self.in_think = False
+        self.done = False
+
+    def feed(self, chunk: str) -> List[tuple]:
+        self.buf += chunk
+        events: List[tuple] = []
+        while self.pos < len(self.buf) and not self.done:
+            if not self.stack and not self._skip_preamble():
+                break  # wait for more text
+            self._step(self.buf[self.pos], events)
+            self.pos += 1
+        return events
+
+    def _skip_preamble(self) -> bool:
+        """Move past a reasoning block; False when more input is needed."""
+        if not self.in_think:
+            head = self.buf[self.pos : self.pos + len(self._THINK_OPEN)]
+            if not self._THINK_OPEN.startswith(head) or head[:1] != "<":
+                return True
+            if head != self._THINK_OPEN:
+                return False  # maybe a split "<think>" tag
+            self.in_think = True
+            self.pos += len(head)
+        end = self.buf.find(self._THINK_CLOSE, self.pos)
+        if end < 0:
+            self.pos = max(self.pos, len(self.buf) - len(self._THINK_CLOSE))
+            return False
+        self.in_think = False
+        self.pos = end + len(self._THINK_CLOSE)
+        return self.pos < len(self.buf)
+
+    # ── scanner ──────────────────────────────────────────────────────
+    def _frame(self, kind: str, emit: bool, key: str = None) -> Dict[str, Any]:
+        # state (objects): key → colon → value → comma
+        return {
+            "kind": kind,
+            "emit": emit,
+            "key": key,
+            "state": "key",
+            "index": 0,
+            "member": None,
+            "start": None,
+        }
+
+    def _complete(self, frame: Dict[str, Any], end: int, events: List[tuple]):
+        raw = self.buf[frame["start"] : end]
+        frame["start"] = None
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            path = (
+                frame["member"]
+                if frame["kind"] == "{"
+                else f"{frame['key']}[{frame['index']}]"
+            )
+            raise SchemaDivergence(path, f"invalid JSON value {raw[:40]!r}")
+        if frame["kind"] == "{":
+            events.append(("field", frame["member"], value))
+        else:
+            events.append(("item", frame["key"], frame["index"], value))
+
+    def _value_starts(self, top: Dict[str, Any]) -> bool:
+        return top["emit"] and top["start"] is None and (
+            top["kind"] == "[" or top["state"] == "value"
+        )
+
+    def _step(self, ch: str, events: List[tuple]) -> None:
+        if self.in_string:
+            if self.escape:
+                self.escape = False
+            elif ch == "\\":
+                self.escape = True
+            elif ch == '"':
+                self.in_string = False
+                top = self.stack[-1]
+                if top["kind"] == "{" and top["state"] == "key":
+                    key = json.loads(self.buf[self.string_start : self.pos + 1])
+                    if (
+                        len(self.stack) == 1
+                        and self.allowed_keys is not None
+                        and key not in self.allowed_keys
+                    ):
+                        raise SchemaDivergence(key, "unknown top-level key")
+                    top["member"] = key
+                    top["state"] = "colon"
+                else:
+                    if top["emit"] and top["start"] == self.string_start:
+                        self._complete(top, self.pos + 1, events)
+                    top["state"] = "comma"
+            return
+
+        if ch in " \t\r\n":
+            return
+        if not self.stack:
+            if ch == "{":
+                self.stack.append(self._frame("{", emit=True))
+            return  # preamble before the object
+
+        top = self.stack[-1]
+        if ch == '"':
+            self.in_string = True
+            self.string_start = self.pos
+            if self._value_starts(top):
+                top["start"] = self.pos
+        elif ch in "{[":
+            if self._value_starts(top):
+                top["start"] = self.pos
+            streamed = (
+                ch == "["
+                and len(self.stack) == 1
+                and top["member"] in self.stream_arrays
+            )
+            self.stack.append(self._frame(ch, emit=streamed, key=top["member"]))
+        elif ch in "}]":
+            if top["emit"] and top["start"] is not None:
+                self._complete(top, self.pos, events)  # trailing scalar
+            self.stack.pop()
+            if not self.stack:
+                self.done = True
+                return
+            parent = self.stack[-1]
+            if parent["emit"] and parent["start"] is not None:
+                self._complete(parent, self.pos + 1, events)
+            parent["state"] = "comma"
+        elif ch == ",":
+            if top["emit"] and top["start"] is not None:
+                self._complete(top, self.pos, events)
+            top["state"] = "key"
+            top["index"] += 1
+        elif ch == ":":
+            top["state"] = "value"
+        elif self._value_starts(top):
+            top["start"] = self.pos  # number / true / false / null
+
+
+# ----------------- Invoice schema ---------------------
+_STR = (str,)
+_NUM = (int, float)
+INVOICE_SCHEMA = {
+    "supplier": {"name": _STR, "vat": _STR},
+    "invoice_no": _STR,
+    "date": _STR,
+    "items": {
+        "description": _STR,
+        "product_code": _STR,
+        "qty": (int,),
+        "unit_price": _NUM,
+        "line_total": _NUM,
+        "po_number": _STR,
+    },
+    "totals": {"subtotal": _NUM, "vat": _NUM, "total": _NUM},
+}
+REQUIRED_FIELDS = ("supplier", "invoice_no", "items", "totals")
+
+
+def _check_object(path: str, value: Any, fields: Dict[str, tuple]) -> None:
+    if not isinstance(value, dict):
+        raise SchemaDivergence(path, f"expected an object, got {type(value).__name__}")
+    for k, v in value.items():
+        if k not in fields:
+            raise SchemaDivergence(f"{path}.{k}", "unknown key")
+        if v is not None and (
+            not isinstance(v, fields[k]) or isinstance(v, bool)
+        ):
+            expected = "/".join(t.__name__ for t in fields[k])
+            raise SchemaDivergence(f"{path}.{k}", f"expected {expected}, got {v!r}")
+
+
+def check_field(key: str, value: Any) -> None:
+    if key not in INVOICE_SCHEMA:
+        raise SchemaDivergence(key, "unknown top-level key")
+    spec = INVOICE_SCHEMA[key]
+    if key == "items":
+        if not isinstance(value, list):
+            raise SchemaDivergence(key, "expected an array")
+    elif isinstance(spec, dict):
+        _check_object(key, value, spec)
+    elif value is not None and not isinstance(value, spec):
+        # A null invoice_no/date is an unread field, as in nested objects
+        raise SchemaDivergence(key, f"expected a string, got {value!r}")
+
+
+def check_item(index: int, item: Any) -> None:
+    _check_object(f"items[{index}]", item, INVOICE_SCHEMA["items"])
+
+
+def validate_invoice(result: Any) -> None:
+    """Check a complete invoice dict against the schema (raises SchemaDivergence)."""
+    if not isinstance(result, dict):
+        raise SchemaDivergence("$", "expected an object")
+    for key, value in result.items():
+        check_field(key, value)
+    for index, item in enumerate(result.get("items") or []):
+        check_item(index, item)
+    for key in REQUIRED_FIELDS:
+        if key not in result:
+            raise SchemaDivergence(key, "missing")
+
+
+class InvoiceStreamParser:
+    """Turn streamed completion text into invoice events, validated on the fly.
+
+    Events: ``("supplier", {...})``, ``("header", {"invoice_no", "date"})``,
+    ``("item", {...})`` per line item and ``("totals", {...})``.
+    """
+
+    def __init__(self):
+        self.json = IncrementalJSONParser(
+            stream_arrays=("items",), allowed_keys=INVOICE_SCHEMA
+        )
+        self.result: Dict[str, Any] = {}
+        self.items: List[Dict[str, Any]] = []
+        self._header_sent = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        events = []
+        for event in self.json.feed(chunk):
+            if event[0] == "item":
+                _, _, index, item = event
+                check_item(index, item)
+                self.items.append(item)
+                events.append(("item", item))
+                continue
+            _, key, value = event
+            check_field(key, value)
+            self.result[key] = value
+            if key in ("supplier", "totals"):
+                events.append((key, value))
+            elif key in ("invoice_no", "date") and not self._header_sent:
+                if "invoice_no" in self.result and "date" in self.result:
+                    events.append(("header", self.header()))
+                    self._header_sent = True
+        return events
+
+    def header(self) -> Dict[str, str]:
+        return {k: self.result.get(k, "") for k in ("invoice_no", "date")}
+
+    def finish(self) -> Tuple[Dict[str, Any], List[Tuple[str, Any]]]:
+        """Final result plus any events still owed (e.g. a header without date)."""
+        if not self.json.done:
+            raise SchemaDivergence("$", "response ended before the JSON object closed")
+        for key in REQUIRED_FIELDS:
+            if key not in self.result:
+                raise SchemaDivergence(key, "missing")
+        events = []
+        if not self._header_sent:
+            events.append(("header", self.header()))
+            self._header_sent = True
+        return self.result, events
+
+
+# ----------------- Streaming call ---------------------
+def add_usage(total: Dict[str, Any], usage: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the token counts of *usage* into *total* (nested details too)."""
+    for key, value in usage.items():
+        if isinstance(value, dict):
+            add_usage(total.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            total[key] = (total.get(key) or 0) + value
+        elif key not in total:
+            total[key] = value
+    return total
+
+
+def stream_invoice(
+    client,
+    model: str,
+    messages: List[Dict[str, str]],
+    on_event: Callable[[str, Any], None] = None,
+    max_reasks: int = 1,
+    **request_options,
+) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+    """Stream a chat completion and parse the invoice JSON while it arrives.
+
+    *on_event(kind, data)* is called for every completed supplier / header /
+    item / totals. When the stream leaves the schema it is closed right away
+    and the model is re-asked once, with the exact problem named.
+
+    Returns (result, usage, stream stats).
+    """
+    start = time.perf_counter()
+    stats: Dict[str, Any] = {
+        "first_field_sec": None,
+        "reasks": 0,
+        "divergences": [],
+        "usage_estimated": False,
+    }
+    usage: Dict[str, Any] = {}  # summed over all attempts
+    messages = list(messages)
+    sent: Dict[str, int] = {}  # events of each kind the consumer has seen
+    seen: Dict[str, int] = {}  # ... and produced by the current attempt
+
+    def emit(kind: str, data: Any):
+        # A re-ask replays the events before the divergence; send them once
+        n = seen.get(kind, 0)
+        seen[kind] = n + 1
+        if n < sent.get(kind, 0):
+            return
+        sent[kind] = n + 1
+        if stats["first_field_sec"] is None:
+            stats["first_field_sec"] = round(time.perf_counter() - start, 3)
+        if on_event is not None:
+            on_event(kind, data)
+
+    for attempt in range(max_reasks + 1):
+        parser = InvoiceStreamParser()
+        text = ""
+        reported = False
+        seen.clear()
+        stream = client.chat.completions.create(
+            model=model,
+            response_format={"type": "json_object"},
+            temperature=0,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+            **request_options,
+        )
+        try:
+            for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    add_usage(usage, chunk.usage.model_dump())
+                    reported = True
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                text += delta
+                for kind, data in parser.feed(delta):
+                    emit(kind, data)
+            result, events = parser.finish()
+            for kind, data in events:
+                emit(kind, data)
+            stats["total_sec"] = round(time.perf_counter() - start, 3)
+            return result, usage, stats
+        except SchemaDivergence as e:
+            stats["divergences"].append(
+                {"path": e.path, "reason": e.reason, "after_chars": len(text)}
+            )
+            if not reported:
+                # Closed before the usage chunk: count the aborted attempt at
+                # ~4 characters per token (as `LLMBatching.estimate_tokens`)
+                prompt = math.ceil(sum(len(m.get("content", "")) for m in messages) / 4)
+                completion = math.ceil(len(text) / 4)
+                add_usage(
+                    usage,
+                    {
+                        "prompt_tokens": prompt,
+                        "completion_tokens": completion,
+                        "total_tokens": prompt + completion,
+                    },
+                )
+                stats["usage_estimated"] = True
+            if attempt == max_reasks:
+                raise
+            print(f"⚠️ Stream diverged at {e} — aborting and re-asking...")
+            stats["reasks"] += 1
+            messages = messages[:2] + [
+                {"role": "assistant", "content": text},
+                {
+                    "role": "user",
+                    "content": f"Your JSON is invalid at `{e.path}`: {e.reason}. "
+                    "Return the complete invoice JSON again, following the schema exactly.",
+                },
+            ]
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()  # stops paying for tokens after a divergence
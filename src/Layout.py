@@ -1,3 +1,4 @@
+import torch
 from transformers import AutoProcessor, AutoModelForTokenClassification
 from PIL import ImageDraw, ImageFont
 
@@ -56,8 +57,10 @@ class LabelSet:
 
 
 class LayoutLvm3:
-    def __init__(self, model_name="nielsr/layoutlmv3-finetuned-funsd"):
+    def __init__(self, model_name="nielsr/layoutlmv3-finetuned-funsd", num_threads=None):
         self.model_name = model_name
+        if num_threads:
+            torch.set_num_threads(num_threads)
         self.processor = AutoProcessor.from_pretrained(model_name, apply_ocr=False)
         self.model = AutoModelForTokenClassification.from_pretrained(model_name)
 
@@ -0,0 +1,202 @@
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Sequence, Union
+
+import numpy as np
+
+
+def polys_to_xywh(polys: Sequence) -> np.ndarray:
+    """Vectorized polygon → [x, y, w, h] conversion (float32, N×4)."""
+    if polys is None or len(polys) == 0:
+        return np.zeros((0, 4), dtype=np.float32)
+    pts = np.asarray(polys, dtype=np.float32).reshape(len(polys), -1, 2)
+    mins = pts.min(axis=1)
+    maxs = pts.max(axis=1)
+    return np.concatenate([mins, maxs - mins], axis=1)
+
+
+class _ColumnarLayout:
+    """OCR lines stored column-wise: one array per field, texts in one buffer.
+
+    Line *i* owns ``buffer[offsets[i]:offsets[i + 1]]``. Indexing returns the
+    same dict records the pipelines used to build (`page`, `text`, `score`,
+    `box`), so list-of-dict consumers keep working.
+    """
+
+    def __init__(
+        self,
+        pages: np.ndarray,
+        scores: np.ndarray,
+        boxes: np.ndarray,
+        offsets: np.ndarray,
+        buffer: str,
+    ):
+        self.pages = pages
+        self.scores = scores
+        self.boxes = boxes
+        self.offsets = offsets
+        self.buffer = buffer
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def text(self, i: int) -> str:
+        return self.buffer[self.offsets[i] : self.offsets[i + 1]]
+
+    @property
+    def texts(self) -> List[str]:
+        return [self.text(i) for i in range(len(self))]
+
+    def record(self, i: int) -> Dict[str, Any]:
+        return {
+            "page": int(self.pages[i]),
+            "text": self.text(i),
+            "score": round(float(self.scores[i]), 3),
+            "box": self.boxes[i].tolist(),
+        }
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if isinstance(i, slice):
+            return [self.record(k) for k in range(len(self))[i]]
+        return self.record(range(len(self))[i])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self.record(i) for i in range(len(self)))
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return list(self)
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.pages.nbytes
+            + self.scores.nbytes
+            + self.boxes.nbytes
+            + self.offsets.nbytes
+            + len(self.buffer.encode("utf-8"))
+        )
+
+
+class PageLayout(_ColumnarLayout):
+    """Columnar OCR lines of a single page."""
+
+    @classmethod
+    def from_ocr(
+        cls,
+        page: int,
+        lines: Sequence[str],
+        scores: Sequence[float],
+        boxes: Union[Sequence, np.ndarray],
+    ) -> "PageLayout":
+        """Build from one `run_ocr` result (boxes already xywh)."""
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        scores = np.asarray(scores, dtype=np.float32)
+        n = min(len(lines), len(scores), len(boxes))
+        lines = list(lines[:n])
+        lengths = np.fromiter((len(t) for t in lines), dtype=np.int64, count=n)
+        return cls(
+            pages=np.full(n, page, dtype=np.int32),
+            scores=scores[:n],
+            boxes=boxes[:n],
+            offsets=np.concatenate([[0], np.cumsum(lengths)]),
+            buffer="".join(lines),
+        )
+
+
+class DocumentLayout(_ColumnarLayout):
+    """Columnar OCR lines of a whole document, appended page by page.
+
+    Pages are kept as separate chunks until a column is read, then merged
+    once; `page(n)` returns zero-copy array views of that page's rows.
+    """
+
+    def __init__(self):
+        self._cols: Dict[str, Any] = {}
+        self._pending: List[PageLayout] = []
+        super().__init__(
+            pages=np.zeros(0, dtype=np.int32),
+            scores=np.zeros(0, dtype=np.float32),
+            boxes=np.zeros((0, 4), dtype=np.float32),
+            offsets=np.zeros(1, dtype=np.int64),
+            buffer="",
+        )
+
+    def append(self, page: PageLayout) -> None:
+        self._pending.append(page)
+
+    def _merge(self) -> None:
+        cols = self._cols
+        chunks = [PageLayout(**cols)] + self._pending
+        base = np.cumsum([0] + [len(c.buffer) for c in chunks])
+        cols["offsets"] = np.concatenate(
+            [c.offsets[:-1] - c.offsets[0] + b for c, b in zip(chunks, base)]
+            + [base[-1:]]
+        )
+        cols["pages"] = np.concatenate([c.pages for c in chunks])
+        cols["scores"] = np.concatenate([c.scores for c in chunks])
+        cols["boxes"] = np.concatenate([c.boxes for c in chunks])
+        cols["buffer"] = "".join(c.buffer for c in chunks)
+        self._pending.clear()
+
+    def _column(name: str):
+        def getter(self):
+            if self._pending:
+                self._merge()
+            return self._cols[name]
+
+        def setter(self, value):
+            self._cols[name] = value
+
+        return property(getter, setter)
+
+    pages = _column("pages")
+    scores = _column("scores")
+    boxes = _column("boxes")
+    offsets = _column("offsets")
+    buffer = _column("buffer")
+    del _column
+
+    def page(self, page: int) -> PageLayout:
+        """Rows of *page* (1-based) as array views; pages must be appended in order."""
+        lo, hi = np.searchsorted(self.pages, [page, page + 1])
+        return PageLayout(
+            pages=self.pages[lo:hi],
+            scores=self.scores[lo:hi],
+            boxes=self.boxes[lo:hi],
+            offsets=self.offsets[lo : hi + 1],
+            buffer=self.buffer,
+        )
+
+    # ── serialization ─────────────────────────────────────────────────
+    def save_npz(self, path: Path) -> None:
+        np.savez_compressed(
+            path,
+            pages=self.pages,
+            scores=self.scores,
+            boxes=self.boxes,
+            text_lengths=np.diff(self.offsets),
+            text_utf8=np.frombuffer(self.buffer.encode("utf-8"), dtype=np.uint8),
+        )
+
+    @classmethod
+    def load_npz(cls, path: Path) -> "DocumentLayout":
+        data = np.load(path)
+        layout = cls()
+        layout.pages = data["pages"]
+        layout.scores = data["scores"]
+        layout.boxes = data["boxes"]
+        layout.offsets = np.concatenate([[0], np.cumsum(data["text_lengths"])])
+        layout.buffer = data["text_utf8"].tobytes().decode("utf-8")
+        return layout
+
+    def to_arrow(self):
+        """Zero-copy `pyarrow.Table` of the numeric columns plus the texts."""
+        import pyarrow as pa
+
+        return pa.table(
+            {
+                "page": self.pages,
+                "text": pa.array(self.texts, type=pa.string()),
+                "score": self.scores,
+                "box": pa.FixedSizeListArray.from_arrays(self.boxes.reshape(-1), 4),
+            }
+        )
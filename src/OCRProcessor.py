@@ -5,57 +5,173 @@ import numpy as np
 from typing import List, Dict, Any, Tuple
 from pathlib import Path
 import re
+from src.OCRLayout import polys_to_xywh
+from src.regex_extraction_helpers import numeric_field_suspect
+from src.Preprocessing import PagePreprocessor
 
 
 class OCRProcessor:
-    def __init__(self, dpi=300, lang="en"):
+    def __init__(
+        self,
+        dpi=300,
+        lang="en",
+        cpu_threads=None,
+        two_pass=False,
+        low_dpi=150,
+        min_score=0.9,
+        preprocess=False,
+        binarize=False,
+    ):
+        """
+        two_pass   – render pages at *low_dpi*, then re-recognize only the lines
+                     scoring below *min_score* (or holding a malformed amount)
+                     from high-*dpi* clips of the PDF page
+        preprocess – grayscale, crop margins and deskew pages before OCR
+                     (see `PagePreprocessor`); boxes stay in page space
+        binarize   – also Otsu-binarize preprocessed pages
+        """
         self.dpi = dpi
+        self.lang = lang
+        self.two_pass = two_pass
+        self.low_dpi = low_dpi
+        self.min_score = min_score
+        #: DPI pages are rendered at for the first (or only) OCR pass
+        self.render_dpi = low_dpi if two_pass else dpi
+        self.refine_stats = {"lines": 0, "rechecked": 0, "replaced": 0}
+        self.preprocessor = (
+            PagePreprocessor(binarize=binarize) if preprocess or binarize else None
+        )
+        #: `PageTransform.report()` of the page OCR'd last (preprocess only)
+        self.last_preprocess = None
+        # cpu_threads caps Paddle's intra-op pool (default: all cores)
+        extra = {"cpu_threads": cpu_threads} if cpu_threads else {}
         self.ocr = PaddleOCR(
             lang=lang,
             use_doc_orientation_classify=False,
             use_doc_unwarping=False,
             use_textline_orientation=False,
+            **extra,
         )
 
+    def options(self) -> Dict[str, Any]:
+        """Settings that change what OCR returns for a given page image."""
+        return {
+            "dpi": self.dpi,
+            "lang": self.lang,
+            "two_pass": self.two_pass and [self.low_dpi, self.min_score],
+            "preprocess": self.preprocessor is not None,
+            "binarize": bool(self.preprocessor and self.preprocessor.binarize),
+        }
+
     def pdf_to_images(self, pdf_path: Path) -> List[Image.Image]:
         doc = fitz.open(pdf_path)
-        return [
-            Image.frombytes(
-                "RGB",
-                (
-                    page.get_pixmap(dpi=self.dpi).width,
-                    page.get_pixmap(dpi=self.dpi).height,
-                ),
-                page.get_pixmap(dpi=self.dpi).samples,
-            )
-            for page in doc
-        ]
+        return [self.render_page(page) for page in doc]
+
+    def render_page(self, page: fitz.Page, dpi: int = None) -> Image.Image:
+        pix = page.get_pixmap(dpi=dpi or self.render_dpi)
+        return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
 
     def run_ocr(
-        self, img: Image.Image
+        self, img: Image.Image, page: fitz.Page = None
     ) -> Tuple[str, List[float], List[List[List[int]]]]:
         """Run OCR and get line‑level layout.
 
+        In two-pass mode pass the PDF *page* *img* was rendered from, so weak
+        lines can be re-read from high-DPI clips of it.
+
         Returns:
             text   – concatenated line texts separated by newlines
             scores – list of confidences per line
-            boxes  – list of 4‑point polygons [[x,y],...] per line (PaddleOCR order)
+            boxes  – list of [x, y, w, h] boxes per line (from PaddleOCR polygons)
         """
-        result = self.ocr.predict(np.array(img))[0]  # (boxes, (text, score)) per line
+        text, scores, boxes, _ = self.run_ocr_arrays(img, page)
+        # PaddleOCR polygons are integer pixels, keep int boxes for consumers
+        return text, scores.tolist(), np.rint(boxes).astype(int).tolist()
 
-        texts = result.get("rec_texts", [])
-        scores = [float(s) for s in result.get("rec_scores", [])]
+    def run_ocr_arrays(
+        self, img: Image.Image, page: fitz.Page = None
+    ) -> Tuple[str, np.ndarray, np.ndarray, List[str]]:
+        """Same as `run_ocr` but scores/boxes stay float32 arrays (N and N×4).
 
-        polys = result.get("rec_polys")
+        Also returns the N line texts themselves: the cleaned *text* may no
+        longer split into one line per box.
+        """
+        ocr_input, transform = (
+            self.preprocessor(img) if self.preprocessor else (img, None)
+        )
+        # (boxes, (text, score)) per line
+        result = self.ocr.predict(np.array(ocr_input))[0]
 
-        boxes = []
-        for poly in polys:
-            x_coords = [pt[0] for pt in poly]
-            y_coords = [pt[1] for pt in poly]
-            x, y = min(x_coords), min(y_coords)
-            w, h = max(x_coords) - x, max(y_coords) - y
-            boxes.append([x, y, w, h])
+        texts = list(result.get("rec_texts", []))
+        scores = np.asarray(result.get("rec_scores", []), dtype=np.float32)
+        polys = result.get("rec_polys")
+        if transform is not None:
+            # Back to the rendered page, so layout_data/refinement see page pixels
+            if polys is not None and len(polys):
+                polys = transform.to_original(
+                    np.asarray(polys, dtype=np.float32).reshape(len(polys), -1, 2)
+                )
+            self.last_preprocess = transform.report()
+        boxes = polys_to_xywh(polys)
+        if self.two_pass and page is not None and len(texts):
+            self.refine_lines(page, img.size, texts, scores, boxes)
 
         clean_text = "\n".join(texts).strip()
         clean_text = re.sub(r"\s{2,}", " ", clean_text)
-        return clean_text, scores, boxes
+        return clean_text, scores, boxes, texts
+
+    # ── Two-pass mode: selective high-DPI re-recognition ──────────────
+    def refine_lines(
+        self,
+        page: fitz.Page,
+        img_size: Tuple[int, int],
+        texts: List[str],
+        scores: np.ndarray,
+        boxes: np.ndarray,
+    ) -> List[int]:
+        """Re-read weak lines from high-DPI clips; updates texts/scores in place.
+
+        Boxes stay in the low-resolution image space, so the merged result
+        keeps the `run_ocr` contract. Returns the indices of replaced lines.
+        """
+        weak = np.flatnonzero(scores < self.min_score)
+        suspect = [i for i, t in enumerate(texts) if numeric_field_suspect(t)]
+        todo = sorted(set(weak.tolist()) | set(suspect))
+        self.refine_stats["lines"] += len(texts)
+        self.refine_stats["rechecked"] += len(todo)
+        # Clips are cut in unrotated page space, rotated pages keep pass 1
+        if not todo or page.rotation:
+            return []
+
+        # Image pixels → PDF points (also right for resized renders)
+        sx = page.rect.width / img_size[0]
+        sy = page.rect.height / img_size[1]
+        clips = []
+        for i in todo:
+            x, y, w, h = boxes[i]
+            pad = 0.25 * h
+            rect = fitz.Rect(
+                (x - pad) * sx, (y - pad) * sy, (x + w + pad) * sx, (y + h + pad) * sy
+            ) & page.rect
+            pix = page.get_pixmap(dpi=self.dpi, clip=rect)
+            clips.append(
+                np.array(Image.frombytes("RGB", (pix.width, pix.height), pix.samples))
+            )
+
+        replaced = []
+        for i, result in zip(todo, self.ocr.predict(clips)):
+            new_texts = result.get("rec_texts", [])
+            if not new_texts:
+                continue
+            # A clip may split into several fragments: read them left to right
+            order = np.argsort(polys_to_xywh(result.get("rec_polys"))[:, 0])
+            new_text = " ".join(new_texts[k] for k in order)
+            new_score = float(np.mean(result.get("rec_scores", [0.0])))
+            fixed_number = numeric_field_suspect(texts[i]) and not numeric_field_suspect(
+                new_text
+            )
+            if new_score > scores[i] or fixed_number:
+                texts[i], scores[i] = new_text, new_score
+                replaced.append(i)
+        self.refine_stats["replaced"] += len(replaced)
+        return replaced
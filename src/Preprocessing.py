@@ -0,0 +1,183 @@
+import math
+import time
+from typing import Dict, Any, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+def to_grayscale(rgb: np.ndarray) -> np.ndarray:
+    """ITU-R 601 luma in integer arithmetic (H×W×3 uint8 → H×W uint8)."""
+    if rgb.ndim == 2:
+        return rgb
+    # in-place uint16 ops: no float temporaries the size of the page
+    luma = rgb[..., 0].astype(np.uint16)
+    luma *= 77
+    for channel, weight in ((1, 150), (2, 29)):
+        tmp = rgb[..., channel].astype(np.uint16)
+        tmp *= weight
+        luma += tmp
+    luma >>= 8
+    return luma.astype(np.uint8)
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """Threshold maximizing the between-class variance of the histogram.
+
+    Returned as the first level of the light class, so ink is ``gray < t``.
+    """
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256, dtype=np.float64)
+    weight_bg = np.cumsum(hist)
+    weight_fg = weight_bg[-1] - weight_bg
+    cum_mean = np.cumsum(hist * levels)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_bg = cum_mean / weight_bg
+        mean_fg = (cum_mean[-1] - cum_mean) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.nanargmax(between)) + 1
+
+
+def ink_bbox(ink: np.ndarray, min_fraction: float = 0.002) -> Tuple[int, int, int, int]:
+    """(x0, y0, x1, y1) of the rows/columns that are more than *min_fraction*
+    ink, so isolated scanner speckle does not keep a margin."""
+    h, w = ink.shape
+    rows = np.flatnonzero(np.count_nonzero(ink, axis=1) > max(2, min_fraction * w))
+    cols = np.flatnonzero(np.count_nonzero(ink, axis=0) > max(2, min_fraction * h))
+    if not len(rows) or not len(cols):
+        return 0, 0, ink.shape[1], ink.shape[0]
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def estimate_skew(
+    ink: np.ndarray,
+    max_angle: float = 5.0,
+    step: float = 0.25,
+    max_points: int = 60000,
+    seed: int = 0,
+) -> float:
+    """Skew angle in degrees (positive: lines fall to the right).
+
+    Projection-profile search done for every candidate angle at once: ink
+    pixels are sheared by ``y - x·tan(a)`` and binned into rows. The angle
+    whose profile is sharpest (largest sum of squared row counts) wins.
+    """
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 100:
+        return 0.0
+    if len(ys) > max_points:
+        keep = np.random.default_rng(seed).choice(len(ys), max_points, replace=False)
+        ys, xs = ys[keep], xs[keep]
+    angles = np.arange(-max_angle, max_angle + step / 2, step)
+    tans = np.tan(np.radians(angles))
+    sheared = ys[None, :] - xs[None, :] * tans[:, None]  # A × N
+    rows = np.rint(sheared - sheared.min()).astype(np.int64)
+    n_rows = int(rows.max()) + 1
+    flat = rows + np.arange(len(angles))[:, None] * n_rows
+    profiles = np.bincount(flat.ravel(), minlength=len(angles) * n_rows)
+    scores = (profiles.reshape(len(angles), n_rows).astype(np.float64) ** 2).sum(1)
+    return float(angles[int(np.argmax(scores))])
+
+
+class PageTransform:
+    """Maps points of the preprocessed image back to the rendered page."""
+
+    def __init__(self, size: Tuple[int, int]):
+        self.original_size = size
+        self.crop = (0, 0, size[0], size[1])  # x0, y0, x1, y1
+        self.angle = 0.0  # deskew rotation (degrees, counter-clockwise)
+        self.rotated_size = (size[0], size[1])
+        self.timings: Dict[str, float] = {}
+
+    def to_original(self, points: np.ndarray) -> np.ndarray:
+        """Map (..., 2) x/y points into original page pixels (float32)."""
+        pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if self.angle:
+            # Inverse of PIL's `rotate(angle, expand=True)` about the centres
+            w, h = self.crop[2] - self.crop[0], self.crop[3] - self.crop[1]
+            t = math.radians(self.angle)
+            c, s = math.cos(t), math.sin(t)
+            u = pts[:, 0] - self.rotated_size[0] / 2
+            v = pts[:, 1] - self.rotated_size[1] / 2
+            pts = np.stack([c * u - s * v + w / 2, s * u + c * v + h / 2], axis=1)
+        pts = pts + np.array(self.crop[:2], dtype=np.float64)
+        return pts.astype(np.float32).reshape(np.shape(points))
+
+    def report(self) -> Dict[str, Any]:
+        w, h = self.original_size
+        x0, y0, x1, y1 = self.crop
+        return {
+            "crop": list(self.crop),
+            "area_kept": round((x1 - x0) * (y1 - y0) / (w * h), 3) if w * h else 1.0,
+            "skew_deg": self.angle,
+            "timings_ms": {k: round(v * 1000, 2) for k, v in self.timings.items()},
+        }
+
+
+class PagePreprocessor:
+    """Shrink and clean a rendered page before OCR.
+
+    Steps: grayscale → crop white margins → deskew small angles →
+    (optionally) Otsu binarization. All analysis is vectorized NumPy; only
+    the final rotation is done by PIL. `__call__` returns the processed
+    RGB image (PaddleOCR wants three channels) and the `PageTransform` that
+    maps OCR polygons back to the original page, with per-step timings.
+    """
+
+    def __init__(
+        self,
+        binarize: bool = False,
+        margin: int = 16,
+        max_skew: float = 5.0,
+        min_skew: float = 0.2,
+        analysis_width: int = 800,
+    ):
+        """
+        margin         – pixels of whitespace kept around the cropped content
+        min_skew       – smaller estimated angles are left alone
+        analysis_width – the skew is estimated on a copy scaled to this width
+        """
+        self.binarize = binarize
+        self.margin = margin
+        self.max_skew = max_skew
+        self.min_skew = min_skew
+        self.analysis_width = analysis_width
+
+    def __call__(self, img: Image.Image) -> Tuple[Image.Image, PageTransform]:
+        transform = PageTransform(img.size)
+        timings = transform.timings
+
+        t = time.perf_counter()
+        gray = to_grayscale(np.asarray(img))
+        threshold = otsu_threshold(gray[::2, ::2])  # histogram of every 4th pixel
+        ink = gray < threshold
+        timings["grayscale"] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        x0, y0, x1, y1 = ink_bbox(ink)
+        m = self.margin
+        x0, y0 = max(x0 - m, 0), max(y0 - m, 0)
+        x1, y1 = min(x1 + m, gray.shape[1]), min(y1 + m, gray.shape[0])
+        transform.crop = (x0, y0, x1, y1)
+        gray, ink = gray[y0:y1, x0:x1], ink[y0:y1, x0:x1]
+        timings["crop"] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        step = max(1, math.ceil(ink.shape[1] / self.analysis_width))
+        skew = estimate_skew(ink[::step, ::step], self.max_skew)
+        page = Image.fromarray(gray)
+        if abs(skew) >= self.min_skew:
+            transform.angle = skew
+            page = page.rotate(
+                skew, resample=Image.BILINEAR, expand=True, fillcolor=255
+            )
+        transform.rotated_size = page.size
+        timings["deskew"] = time.perf_counter() - t
+
+        out = np.asarray(page)
+        if self.binarize:
+            t = time.perf_counter()
+            out = np.where(out < threshold, 0, 255).astype(np.uint8)
+            timings["binarize"] = time.perf_counter() - t
+
+        return Image.fromarray(out).convert("RGB"), transform
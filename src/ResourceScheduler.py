@@ -0,0 +1,207 @@
+import os
+import sys
+import time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Callable, Optional, Sequence, Tuple
+
+# Thread-pool knobs honoured by Paddle, MKL/OpenBLAS and torch at import time
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+#: Per-process state of a scheduled worker (its spec plus whatever the
+#: worker initializer wants to keep, e.g. a loaded OCRProcessor)
+WORKER: Dict[str, Any] = {}
+
+
+def available_cores() -> List[int]:
+    """CPU ids this process may run on (respects taskset/cgroup affinity)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def pin_current_process(cores: Sequence[int], threads: int) -> None:
+    """Restrict this process to *cores* and size its intra-op pools to *threads*."""
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, set(cores))
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+    # torch reads the env vars only on import; fix it up if already loaded
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+
+
+def _init_worker(specs, initializer: Optional[Callable], initargs: tuple) -> None:
+    try:
+        spec = specs.get(timeout=5)
+    except Exception:  # replacement worker after a crash: share every core
+        spec = {
+            "worker": -1,
+            "cores": available_cores(),
+            "threads": 1,
+            "ocr_threads": 1,
+            "layout_threads": 1,
+        }
+    pin_current_process(spec["cores"], spec["threads"])
+    WORKER.clear()
+    WORKER["spec"] = spec
+    if initializer is not None:
+        initializer(spec, *initargs)
+
+
+# ----------------- Calibration tasks ------------------
+def _calibration_init(spec: Dict[str, Any], ocr_kwargs: Dict[str, Any]) -> None:
+    from src.OCRProcessor import OCRProcessor
+
+    WORKER["ocr"] = OCRProcessor(cpu_threads=spec["ocr_threads"], **ocr_kwargs)
+    if spec["layout_threads"]:
+        from src.Layout import LayoutLvm3
+
+        WORKER["layout"] = LayoutLvm3(num_threads=spec["layout_threads"])
+
+
+def _calibration_task(pdf_path: str, page_no: int) -> float:
+    """Seconds to OCR one page (and run LayoutLMv3 on it, if scheduled)."""
+    import fitz
+    import numpy as np
+
+    ocr, layout = WORKER["ocr"], WORKER.get("layout")
+    with fitz.open(pdf_path) as doc:
+        page = doc[page_no]
+        img = ocr.render_page(page)
+        if layout is not None:
+            from src.InvoiceExtractors import LayoutInvoiceExtractor
+
+            img = img.resize(LayoutInvoiceExtractor.input_size)
+        start = time.perf_counter()
+        # The page stays open: two-pass OCR re-reads weak lines from it
+        _, _, boxes, lines = ocr.run_ocr_arrays(img, page)
+        if layout is not None:
+            layout.infer(img, lines, np.rint(boxes).astype(int).tolist())
+        return time.perf_counter() - start
+
+
+class ResourceScheduler:
+    """Owns the core budget of a run and hands out per-worker slices.
+
+    Every worker process gets a disjoint set of cores (CPU affinity) and a
+    thread budget inside it, so several extractors in parallel no longer each
+    spin up a pool sized to the machine. PaddleOCR (`OCRProcessor`) and, with
+    *layout*, LayoutLMv3 (`LayoutLvm3`) run one after the other on a page,
+    so each of them gets the worker's whole slice.
+    """
+
+    def __init__(self, cores: Sequence[int] = None, layout: bool = False):
+        self.cores = list(cores) if cores else available_cores()
+        self.layout = layout
+        self.calibration: List[Dict[str, Any]] = []
+
+    def candidates(self) -> List[Tuple[int, int]]:
+        """(workers, threads per worker) splits that use every core exactly."""
+        n = len(self.cores)
+        return [(n // t, t) for t in range(1, n + 1) if n % t == 0]
+
+    def plan(self, workers: int, threads: int = None) -> Dict[str, Any]:
+        """Topology for *workers* processes with *threads* cores each."""
+        n = len(self.cores)
+        workers = max(1, workers)
+        threads = threads or max(1, n // workers)
+        ocr_threads = threads
+        layout_threads = threads if self.layout else 0
+
+        specs = []
+        for w in range(workers):
+            cores = [self.cores[(w * threads + k) % n] for k in range(threads)]
+            specs.append(
+                {
+                    "worker": w,
+                    "cores": sorted(set(cores)),
+                    "threads": threads,
+                    "ocr_threads": ocr_threads,
+                    "layout_threads": layout_threads,
+                }
+            )
+        return {
+            "cores": n,
+            "workers": workers,
+            "threads_per_worker": threads,
+            "ocr_threads": ocr_threads,
+            "layout_threads": layout_threads,
+            "oversubscribed": workers * threads > n,
+            "specs": specs,
+            "source": "manual",
+        }
+
+    def executor(
+        self,
+        topology: Dict[str, Any],
+        initializer: Callable = None,
+        initargs: tuple = (),
+    ) -> ProcessPoolExecutor:
+        """Process pool whose workers are pinned according to *topology*."""
+        ctx = mp.get_context()
+        specs = ctx.Queue()
+        for spec in topology["specs"]:
+            specs.put(spec)
+        return ProcessPoolExecutor(
+            max_workers=topology["workers"],
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(specs, initializer, initargs),
+        )
+
+    def calibrate(
+        self,
+        pdf_paths: Sequence[Path],
+        sample_pages: int = 8,
+        ocr_kwargs: Dict[str, Any] = None,
+    ) -> Dict[str, Any]:
+        """Time a few sample pages under each split and keep the fastest.
+
+        Pages are OCR'd with the run's *ocr_kwargs* (DPI, two-pass,
+        preprocessing) and, with *layout*, also run through LayoutLMv3, so
+        the split is chosen for the work the run will actually do.
+        """
+        import fitz
+
+        sample: List[Tuple[str, int]] = []
+        for pdf in pdf_paths:
+            with fitz.open(pdf) as doc:
+                sample += [(str(pdf), i) for i in range(len(doc))]
+            if len(sample) >= sample_pages:
+                break
+        sample = sample[:sample_pages]
+        if not sample:
+            return self.plan(1)
+
+        self.calibration.clear()
+        for workers, threads in self.candidates():
+            if workers > len(sample):
+                continue
+            topology = self.plan(workers, threads)
+            with self.executor(topology, _calibration_init, (ocr_kwargs or {},)) as pool:
+                # Warm-up: load the OCR models in every worker before timing
+                list(pool.map(_calibration_task, *zip(*sample[:workers])))
+                start = time.perf_counter()
+                list(pool.map(_calibration_task, *zip(*sample)))
+                elapsed = time.perf_counter() - start
+            rate = round(len(sample) / elapsed, 3)
+            self.calibration.append(
+                {"workers": workers, "threads": threads, "pages_per_sec": rate}
+            )
+            print(f"⏱ Calibration {workers}×{threads}: {rate} pages/s")
+
+        if not self.calibration:
+            return self.plan(1)
+        best = max(self.calibration, key=lambda c: c["pages_per_sec"])
+        topology = self.plan(best["workers"], best["threads"])
+        topology["source"] = "calibrated"
+        topology["calibration"] = list(self.calibration)
+        return topology
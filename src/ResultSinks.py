@@ -0,0 +1,313 @@
+import os
+import json
+import time
+import sqlite3
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional
+
+
+# Columns shared by every sink. Nested payloads (result, usage, ocr_stats,
+# timings) are stored as JSON strings so all backends keep the same schema.
+RECORD_COLUMNS = (
+    "file",
+    "part",
+    "method",
+    "supplier",
+    "invoice_no",
+    "result",
+    "usage",
+    "ocr_stats",
+    "timings",
+    "created_at",
+)
+_JSON_COLUMNS = ("result", "usage", "ocr_stats", "timings")
+
+
+def make_record(
+    file: str,
+    method: str,
+    result: Dict[str, Any],
+    usage: Optional[Dict[str, Any]] = None,
+    ocr_stats: Optional[Dict[str, Any]] = None,
+    timings: Optional[Dict[str, Any]] = None,
+    part: int = 0,
+) -> Dict[str, Any]:
+    """Build one flat sink row for an extracted invoice."""
+    return {
+        "file": file,
+        "part": part,
+        "method": method,
+        "supplier": (result.get("supplier") or {}).get("name", ""),
+        "invoice_no": result.get("invoice_no", ""),
+        "result": result,
+        "usage": usage or {},
+        "ocr_stats": ocr_stats or {},
+        "timings": timings or {},
+        "created_at": round(time.time(), 3),
+    }
+
+
+def _to_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    row = {k: record.get(k) for k in RECORD_COLUMNS}
+    for k in _JSON_COLUMNS:
+        row[k] = json.dumps(row[k] or {}, ensure_ascii=False)
+    return row
+
+
+def _from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    record = dict(row)
+    for k in _JSON_COLUMNS:
+        if isinstance(record.get(k), str):
+            record[k] = json.loads(record[k])
+    return record
+
+
+class BaseResultSink:
+    """Buffer extraction records and write them out in batches.
+
+    Each call to `flush()` writes the pending batch as a single unit: either
+    the whole batch becomes visible to readers or none of it does.
+    """
+
+    def __init__(self, path: Path, batch_size: int = 100):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self._pending: List[Dict[str, Any]] = []
+
+    # ── write side ─────────────────────────────────────────────────────
+    def add(self, record: Dict[str, Any]) -> None:
+        self._pending.append(record)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        self._write_batch([_to_row(r) for r in self._pending])
+        self._pending.clear()
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ── read side ──────────────────────────────────────────────────────
+    def records(self, method: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        for row in self._read_rows():
+            if method is None or row.get("method") == method:
+                yield _from_row(row)
+
+    def read_predictions(self, method: Optional[str] = None) -> Dict[str, Dict]:
+        """Map file stem → latest whole-document prediction.
+
+        Without *method* the sink must hold a single method, otherwise the
+        predictions of different methods would overwrite each other.
+        """
+        predictions: Dict[str, Dict] = {}
+        methods = set()
+        for record in self.records(method):
+            if not record.get("part"):
+                predictions[record["file"]] = record["result"]
+                methods.add(record.get("method"))
+        if method is None and len(methods) > 1:
+            raise ValueError(
+                f"{self.path} holds predictions of several methods "
+                f"({', '.join(sorted(map(str, methods)))}); pick one"
+            )
+        return predictions
+
+    # ── backend hooks ──────────────────────────────────────────────────
+    def _write_batch(self, rows: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def _read_rows(self) -> Iterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class JSONLResultSink(BaseResultSink):
+    """Append-only JSON Lines file.
+
+    Every row carries the id of its batch and every batch is terminated by a
+    commit marker with that id and the row count. Readers only return rows of
+    a batch whose marker matches, so a crash mid-batch leaves no partial data
+    and the orphaned rows can't leak into the next batch.
+    """
+
+    _COMMIT_KEY = "__commit__"
+    _BATCH_KEY = "__batch__"
+
+    def __init__(self, path: Path, batch_size: int = 100):
+        super().__init__(path, batch_size)
+        self._seq = 0
+
+    def _write_batch(self, rows: List[Dict[str, Any]]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._seq += 1
+        batch_id = f"{time.time_ns()}-{os.getpid()}-{self._seq}"
+        lines = [
+            json.dumps({**r, self._BATCH_KEY: batch_id}, ensure_ascii=False)
+            for r in rows
+        ]
+        lines.append(json.dumps({self._COMMIT_KEY: batch_id, "rows": len(rows)}))
+        payload = "\n".join(lines) + "\n"
+        with self.path.open("a+b") as f:
+            # Start on a fresh line if the previous writer died mid-line
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    payload = "\n" + payload
+            f.write(payload.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _read_rows(self) -> Iterator[Dict[str, Any]]:
+        if not self.path.exists():
+            return
+        batch: List[Dict[str, Any]] = []
+        batch_id = None
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    batch, batch_id = [], None  # torn line: its batch is lost
+                    continue
+                if not isinstance(row, dict):
+                    continue
+                if self._COMMIT_KEY in row:
+                    if "rows" in row:
+                        committed = row[self._COMMIT_KEY] == batch_id
+                        committed = committed and row["rows"] == len(batch)
+                    else:  # files written before markers carried a batch id
+                        committed = batch_id is None and row[self._COMMIT_KEY] == len(batch)
+                    if committed:
+                        yield from batch
+                    batch, batch_id = [], None
+                    continue
+                row_batch = row.pop(self._BATCH_KEY, None)
+                if batch and row_batch != batch_id:
+                    batch = []  # rows of an uncommitted batch
+                batch_id = row_batch
+                batch.append(row)
+
+
+class ParquetResultSink(BaseResultSink):
+    """Directory of Parquet part files, one per batch (requires pyarrow)."""
+
+    def __init__(self, path: Path, batch_size: int = 500):
+        super().__init__(path, batch_size)
+        self._seq = 0
+
+    def _write_batch(self, rows: List[Dict[str, Any]]) -> None:
+        import pandas as pd
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._seq += 1
+        name = f"part-{time.time_ns()}-{os.getpid()}-{self._seq:05d}.parquet"
+        # Dot-prefixed files are skipped by Parquet readers until renamed
+        tmp_path = self.path / f".{name}.tmp"
+        pd.DataFrame(rows, columns=RECORD_COLUMNS).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.path / name)
+
+    def _read_rows(self) -> Iterator[Dict[str, Any]]:
+        import pandas as pd
+
+        parts = sorted(self.path.glob("part-*.parquet"))
+        if not parts:
+            return
+        df = pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True)
+        df = df.sort_values("created_at", kind="stable")
+        yield from df.to_dict(orient="records")
+
+
+class SQLiteResultSink(BaseResultSink):
+    """SQLite database indexed on file, supplier and invoice number."""
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            id         INTEGER PRIMARY KEY AUTOINCREMENT,
+            file       TEXT NOT NULL,
+            part       INTEGER NOT NULL DEFAULT 0,
+            method     TEXT,
+            supplier   TEXT,
+            invoice_no TEXT,
+            result     TEXT,
+            usage      TEXT,
+            ocr_stats  TEXT,
+            timings    TEXT,
+            created_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_results_file       ON results(file);
+        CREATE INDEX IF NOT EXISTS idx_results_supplier   ON results(supplier);
+        CREATE INDEX IF NOT EXISTS idx_results_invoice_no ON results(invoice_no);
+    """
+
+    def __init__(self, path: Path, batch_size: int = 100):
+        super().__init__(path, batch_size)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self._SCHEMA)
+
+    def _write_batch(self, rows: List[Dict[str, Any]]) -> None:
+        placeholders = ", ".join(f":{c}" for c in RECORD_COLUMNS)
+        with self.conn:  # one transaction per batch
+            self.conn.executemany(
+                f"INSERT INTO results ({', '.join(RECORD_COLUMNS)}) "
+                f"VALUES ({placeholders})",
+                rows,
+            )
+
+    def _read_rows(self) -> Iterator[Dict[str, Any]]:
+        cursor = self.conn.execute(
+            f"SELECT {', '.join(RECORD_COLUMNS)} FROM results ORDER BY id"
+        )
+        for values in cursor:
+            yield dict(zip(RECORD_COLUMNS, values))
+
+    def close(self) -> None:
+        super().close()
+        self.conn.close()
+
+
+SINK_SUFFIXES = {
+    ".jsonl": JSONLResultSink,
+    ".parquet": ParquetResultSink,
+    ".sqlite": SQLiteResultSink,
+    ".db": SQLiteResultSink,
+}
+
+
+class RecordBuffer:
+    """In-memory stand-in for a sink, filled from several threads.
+
+    `--method all` runs its methods on threads while the real sink (e.g. a
+    SQLite connection) belongs to the calling thread; `replay()` hands the
+    records over from there once the threads are done.
+    """
+
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+
+    def add(self, record: Dict[str, Any]) -> None:
+        self.records.append(record)  # list.append is atomic
+
+    def replay(self, sink: BaseResultSink) -> None:
+        for record in self.records:
+            sink.add(record)
+        self.records.clear()
+
+
+def open_result_sink(path: Path, batch_size: Optional[int] = None) -> BaseResultSink:
+    """Pick the sink backend from the file suffix (.jsonl, .parquet, .sqlite/.db)."""
+    path = Path(path)
+    sink_cls = SINK_SUFFIXES.get(path.suffix.lower())
+    if sink_cls is None:
+        raise ValueError(
+            f"Unsupported result sink '{path}'. Use one of: {', '.join(SINK_SUFFIXES)}"
+        )
+    return sink_cls(path) if batch_size is None else sink_cls(path, batch_size)
@@ -0,0 +1,266 @@
+import re
+from typing import List, Dict, Optional, Sequence
+
+import numpy as np
+
+
+class PageSpatialIndex:
+    """Grid index over the OCR line boxes of one page.
+
+    Boxes are kept as NumPy columns (x0, y0, x1, y1) so row/column clustering
+    and geometric queries are vectorized instead of rescanning the text.
+    """
+
+    def __init__(
+        self,
+        texts: Sequence[str],
+        boxes: Sequence[Sequence[float]],
+        cell_size: Optional[float] = None,
+    ):
+        """
+        Args:
+            texts     – OCR line texts
+            boxes     – matching boxes in xywh, as returned by `OCRProcessor.run_ocr`
+            cell_size – grid cell edge in pixels (defaults to 4× median line height)
+        """
+        self.texts = list(texts)
+        xywh = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        n = min(len(self.texts), len(xywh))
+        self.texts, xywh = self.texts[:n], xywh[:n]
+
+        self.x0, self.y0 = xywh[:, 0], xywh[:, 1]
+        self.x1, self.y1 = self.x0 + xywh[:, 2], self.y0 + xywh[:, 3]
+        self.cx = (self.x0 + self.x1) / 2
+        self.cy = (self.y0 + self.y1) / 2
+        self.line_height = float(np.median(xywh[:, 3])) if n else 1.0
+        self.line_height = max(self.line_height, 1.0)
+
+        self.cell_size = cell_size or 4 * self.line_height
+        self._build_grid()
+        self._build_label_keys()
+        self.row_ids = self._cluster_1d(self.cy, 0.5 * self.line_height)
+        self.col_ids = self._cluster_1d(self.x0, 1.5 * self.line_height)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    # ── construction ──────────────────────────────────────────────────
+    def _build_grid(self):
+        """Bucket every box into each grid cell it overlaps."""
+        self._grid: Dict[tuple, np.ndarray] = {}
+        if not len(self):
+            return
+        gx0 = np.floor(self.x0 / self.cell_size).astype(np.int64)
+        gy0 = np.floor(self.y0 / self.cell_size).astype(np.int64)
+        nx = np.floor(self.x1 / self.cell_size).astype(np.int64) - gx0 + 1
+        ny = np.floor(self.y1 / self.cell_size).astype(np.int64) - gy0 + 1
+
+        # Expand each box into its (cell_x, cell_y) pairs without a Python loop
+        counts = nx * ny
+        idx = np.repeat(np.arange(len(self)), counts)
+        offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cell_x = gx0[idx] + offset % nx[idx]
+        cell_y = gy0[idx] + offset // nx[idx]
+
+        order = np.lexsort((cell_y, cell_x))
+        cell_x, cell_y, idx = cell_x[order], cell_y[order], idx[order]
+        starts = np.flatnonzero(
+            np.r_[True, (np.diff(cell_x) != 0) | (np.diff(cell_y) != 0)]
+        )
+        for start, members in zip(starts, np.split(idx, starts[1:])):
+            self._grid[(int(cell_x[start]), int(cell_y[start]))] = members
+
+    @staticmethod
+    def _cluster_1d(values: np.ndarray, tol: float) -> np.ndarray:
+        """Label values so that neighbours closer than *tol* share a cluster id."""
+        if not len(values):
+            return np.zeros(0, dtype=np.int64)
+        order = np.argsort(values, kind="stable")
+        breaks = np.r_[0, (np.diff(values[order]) > tol).astype(np.int64)]
+        labels = np.empty(len(values), dtype=np.int64)
+        labels[order] = np.cumsum(breaks)
+        return labels
+
+    # ── geometric queries ─────────────────────────────────────────────
+    def query_rect(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        """Indices of boxes intersecting the rectangle (x0, y0)-(x1, y1)."""
+        if not len(self):
+            return np.zeros(0, dtype=np.int64)
+        x1 = min(x1, float(self.x1.max()))
+        y1 = min(y1, float(self.y1.max()))
+        gx = range(int(x0 // self.cell_size), int(x1 // self.cell_size) + 1)
+        gy = range(int(y0 // self.cell_size), int(y1 // self.cell_size) + 1)
+        hits = [self._grid[(i, j)] for i in gx for j in gy if (i, j) in self._grid]
+        if not hits:
+            return np.zeros(0, dtype=np.int64)
+        cand = np.unique(np.concatenate(hits))
+        keep = (
+            (self.x0[cand] <= x1)
+            & (self.x1[cand] >= x0)
+            & (self.y0[cand] <= y1)
+            & (self.y1[cand] >= y0)
+        )
+        return cand[keep]
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return re.sub(r"\s+", "", text).lower()
+
+    def _build_label_keys(self):
+        """Map “label:” prefixes (normalized) to the lines that start with them."""
+        self._norm_texts = [self._normalize(t) for t in self.texts]
+        self._label_keys: Dict[str, List[int]] = {}
+        for i, t in enumerate(self._norm_texts):
+            key = t.split(":", 1)[0].rstrip(":")
+            self._label_keys.setdefault(key, []).append(i)
+
+    def find(self, label: str) -> np.ndarray:
+        """Lines whose “label:” prefix equals *label*, else lines containing it.
+
+        Matching is case-insensitive and ignores whitespace.
+        """
+        key = self._normalize(label).rstrip(":")
+        if key in self._label_keys:
+            return np.array(self._label_keys[key], dtype=np.int64)
+        return np.array(
+            [i for i, t in enumerate(self._norm_texts) if key in t], dtype=np.int64
+        )
+
+    def right_of(self, label: str) -> Optional[str]:
+        """Text of the nearest box on the same row to the right of *label*."""
+        for i in self.find(label):
+            cand = self.query_rect(self.x1[i], self.y0[i], np.inf, self.y1[i])
+            # Require at least half of the label height to overlap vertically
+            overlap = np.minimum(self.y1[cand], self.y1[i]) - np.maximum(
+                self.y0[cand], self.y0[i]
+            )
+            cand = cand[(cand != i) & (overlap >= 0.5 * (self.y1[i] - self.y0[i]))]
+            cand = cand[self.x0[cand] >= self.cx[i]]
+            if len(cand):
+                return self.texts[int(cand[np.argmin(self.x0[cand])])]
+        return None
+
+    def below(self, label: str) -> Optional[str]:
+        """Text of the nearest box under *label* that overlaps it horizontally."""
+        for i in self.find(label):
+            cand = self.query_rect(self.x0[i], self.y1[i], self.x1[i], np.inf)
+            cand = cand[(cand != i) & (self.y0[cand] >= self.cy[i])]
+            if len(cand):
+                return self.texts[int(cand[np.argmin(self.y0[cand])])]
+        return None
+
+    def value_for(self, label: str) -> Optional[str]:
+        """Key-value lookup: value to the right of *label*, else the one below."""
+        value = self.right_of(label)
+        return value if value is not None else self.below(label)
+
+    # ── rows & columns ────────────────────────────────────────────────
+    def rows(self) -> List[np.ndarray]:
+        """Line indices grouped by row (top to bottom), each sorted left to right."""
+        if not len(self):
+            return []
+        order = np.lexsort((self.x0, self.row_ids))
+        starts = np.flatnonzero(np.r_[True, np.diff(self.row_ids[order]) != 0])
+        return np.split(order, starts[1:])
+
+    def columns(self) -> List[np.ndarray]:
+        """Line indices grouped by left-aligned column, each sorted top to bottom."""
+        if not len(self):
+            return []
+        order = np.lexsort((self.y0, self.col_ids))
+        starts = np.flatnonzero(np.r_[True, np.diff(self.col_ids[order]) != 0])
+        return np.split(order, starts[1:])
+
+    def row_cells(self, row: int) -> List[str]:
+        """All cell texts of table row *row* (0 = top row), left to right."""
+        rows = self.rows()
+        return [self.texts[i] for i in rows[row]] if 0 <= row < len(rows) else []
+
+    def row_of(self, label: str) -> List[str]:
+        """All cell texts on the same row as *label*."""
+        hits = self.find(label)
+        if not len(hits):
+            return []
+        same = np.flatnonzero(self.row_ids == self.row_ids[hits[0]])
+        return [self.texts[i] for i in same[np.argsort(self.x0[same])]]
+
+    # ── reading order ─────────────────────────────────────────────────
+    def _gaps(self, lo: np.ndarray, hi: np.ndarray, min_gap: float):
+        """Empty bands along one axis: list of (gap_size, cut_position)."""
+        order = np.argsort(lo, kind="stable")
+        reach = np.maximum.accumulate(hi[order])
+        gap = lo[order][1:] - reach[:-1]
+        at = np.flatnonzero(gap > min_gap)
+        return [(float(gap[k]), float(reach[k])) for k in at]
+
+    def _splits_columns(self, idx: np.ndarray, cut: float, min_rows: int = 3) -> bool:
+        """Whether a vertical cut at x=*cut* separates two real text columns.
+
+        Both sides need *min_rows* rows of their own, and a left side of
+        “Label:” lines next to their values on the same rows is a key-value
+        block (e.g. Subtotal/VAT/Total), which must stay readable row by row.
+        """
+        left, right = idx[self.x1[idx] <= cut], idx[self.x0[idx] > cut]
+        left_rows = np.unique(self.row_ids[left])
+        if min(len(left_rows), len(np.unique(self.row_ids[right]))) < min_rows:
+            return False
+        paired = np.isin(left_rows, self.row_ids[right]).mean()
+        labels = np.mean([self.texts[i].rstrip().endswith(":") for i in left])
+        return not (paired >= 0.8 and labels >= 0.5)
+
+    def _xy_cut(self, idx: np.ndarray, out: List[np.ndarray]):
+        """XY-cut: split on the axis with the widest empty band, then recurse."""
+        if len(idx) > 1:
+            y_gaps = self._gaps(self.y0[idx], self.y1[idx], 0.3 * self.line_height)
+            x_gaps = [
+                (g, c)
+                for g, c in self._gaps(self.x0[idx], self.x1[idx], 2.0 * self.line_height)
+                if self._splits_columns(idx, c)
+            ]
+            best_y = max((g for g, _ in y_gaps), default=0.0)
+            best_x = max((g for g, _ in x_gaps), default=0.0)
+            if best_x > best_y:
+                gaps, hi, other_best = x_gaps, self.x1[idx], best_y
+            else:
+                gaps, hi, other_best = y_gaps, self.y1[idx], best_x
+            # Only cut where the band is wider than anything on the other axis,
+            # so line spacing inside side-by-side blocks does not split them
+            cuts = np.array([c for g, c in gaps if g > other_best], dtype=np.float32)
+            if len(cuts):
+                piece = np.searchsorted(cuts, hi, side="left")
+                for k in range(len(cuts) + 1):
+                    part = idx[piece == k]
+                    if len(part):
+                        self._xy_cut(part, out)
+                return
+        out.append(idx[np.lexsort((self.x0[idx], self.row_ids[idx]))])
+
+    def reading_order(self, mode: str = "columns") -> List[List[int]]:
+        """
+        Line indices in reading order, grouped into output lines.
+
+        mode="rows"    – one output line per visual row (good for tables)
+        mode="columns" – XY-cut first, so side-by-side blocks are read one
+                         block at a time instead of interleaved (label/value
+                         rows and blocks under 3 rows stay together)
+        """
+        if mode == "rows":
+            return [list(map(int, r)) for r in self.rows()]
+        if mode != "columns":
+            raise ValueError("Unsupported reading order. Use 'rows' or 'columns'.")
+        if not len(self):
+            return []
+
+        blocks: List[np.ndarray] = []
+        self._xy_cut(np.arange(len(self)), blocks)
+        lines: List[List[int]] = []
+        for block in blocks:
+            rows = self.row_ids[block]
+            starts = np.flatnonzero(np.r_[True, np.diff(rows) != 0])
+            lines.extend(list(map(int, part)) for part in np.split(block, starts[1:]))
+        return lines
+
+    def reading_order_text(self, mode: str = "columns") -> str:
+        return "\n".join(
+            " ".join(self.texts[i] for i in line) for line in self.reading_order(mode)
+        )
@@ -0,0 +1,397 @@
+import heapq
+import json
+import os
+import signal
+import socket
+import time
+import traceback
+from collections import deque
+from concurrent.futures import BrokenExecutor, Executor, Future, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, every claim dir looks orphaned
+    fcntl = None
+
+
+def unique_path(directory: Path, name: str) -> Path:
+    """*directory*/*name*, or *name* with a ``~N`` suffix if that is taken."""
+    path = directory / name
+    stem, suffix = os.path.splitext(name)
+    n = 1
+    while path.exists():
+        path = directory / f"{stem}~{n}{suffix}"
+        n += 1
+    return path
+
+
+class WatchFolder:
+    """Ingest PDFs dropped into a directory, at least once each.
+
+    Layout under the watched *inbox*::
+
+        inbox/*.pdf                     new files (claimed once their size settled)
+        inbox/processing/<daemon>/      claimed by one daemon, handed to a worker
+        inbox/processing/<daemon>.lock  flock'ed by that daemon while it runs
+        inbox/done/                     extracted
+        inbox/failed/                   the worker raised; <name>.error.json says why
+
+    Every outcome is appended to <output_dir>/watch_log.jsonl and the live
+    counters (backlog, in flight, ingest→result latency) are rewritten to
+    <output_dir>/watch_status.json on every poll.
+
+    A file is claimed by renaming it into the daemon's own processing
+    directory, which is atomic on one filesystem, so a second daemon on the
+    same inbox can't take it too. At startup, files in the processing
+    directory of a daemon whose lock is free (it died) are moved back to
+    the inbox (at-least-once delivery); a live daemon's files are left
+    alone. A file whose worker process died (broken pool) is moved back
+    too, and the daemon then stops.
+
+    Backpressure: at most *max_in_flight* files are submitted to *pool*;
+    everything else stays on disk. Each poll only keeps the oldest
+    *max_in_flight* × 4 inbox entries in memory, however large the backlog.
+    """
+
+    def __init__(
+        self,
+        inbox: Path,
+        pool: Executor,
+        task: Callable[[str, Path], Dict[str, Any]],
+        output_dir: Path,
+        max_in_flight: int = 4,
+        poll_sec: float = 2.0,
+        settle_sec: float = 1.0,
+        status_every: float = 30.0,
+        empty_sec: float = 60.0,
+    ):
+        """
+        task       – task(pdf_path, output_dir), run in *pool* for each file
+        settle_sec – minimum age of the last write before a file is claimed
+        empty_sec  – a file still empty this long after its last write is
+                     moved to failed/ (copies may create it empty first)
+        """
+        self.inbox = Path(inbox)
+        self.processing_root = self.inbox / "processing"
+        self.processing = self.processing_root / f"{socket.gethostname()}-{os.getpid()}"
+        self.done = self.inbox / "done"
+        self.failed = self.inbox / "failed"
+        for d in (self.processing_root, self.done, self.failed):
+            d.mkdir(parents=True, exist_ok=True)
+        self._lock_fd: Optional[int] = None
+        self.pool = pool
+        self.task = task
+        self.output_dir = Path(output_dir)
+        self.max_in_flight = max_in_flight
+        self.poll_sec = poll_sec
+        self.settle_sec = settle_sec
+        self.empty_sec = max(empty_sec, settle_sec)
+        self.status_every = status_every
+
+        self.in_flight: Dict[Future, Tuple[Path, float]] = {}
+        self._sizes: Dict[str, Tuple[int, int]] = {}  # name → (size, mtime_ns)
+        self.latencies: deque = deque(maxlen=1000)
+        self.backlog = 0
+        self.stats: Dict[str, Any] = {
+            "started_at": time.time(),
+            "claimed": 0,
+            "done": 0,
+            "failed": 0,
+            "requeued": 0,
+        }
+        self._stop = False
+        self._last_status = 0.0
+
+    # ── claiming ──────────────────────────────────────────────────────
+    @staticmethod
+    def _lock_path(directory: Path) -> Path:
+        return directory.parent / f"{directory.name}.lock"
+
+    @staticmethod
+    def _try_lock(path: Path, create: bool = False) -> Optional[int]:
+        """Open and exclusively lock *path*; None if another process holds it."""
+        fd = os.open(path, os.O_RDWR | (os.O_CREAT if create else 0))
+        if fcntl is None:
+            return fd
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    def acquire(self) -> None:
+        """Lock this daemon's processing directory for the lifetime of the process.
+
+        The lock file is created before the directory, so a directory without
+        a lock file never belongs to a daemon that is still starting up.
+        """
+        self._lock_fd = self._try_lock(
+            self._lock_path(self.processing), create=True
+        )
+        if self._lock_fd is None:
+            raise RuntimeError(f"{self.processing} is locked by another daemon")
+        self.processing.mkdir(exist_ok=True)
+
+    def release(self) -> None:
+        if self._lock_fd is None:
+            return
+        try:
+            self.processing.rmdir()  # kept if files are still in it
+            self._lock_path(self.processing).unlink()
+        except OSError:
+            pass
+        os.close(self._lock_fd)
+        self._lock_fd = None
+
+    def _requeue_dir(self, directory: Path) -> int:
+        moved = 0
+        for path in sorted(directory.glob("*.pdf")):
+            try:
+                os.rename(path, unique_path(self.inbox, path.name))
+            except FileNotFoundError:
+                continue  # another daemon is requeueing it too
+            moved += 1
+        return moved
+
+    def requeue_orphans(self) -> int:
+        """Move files claimed by daemons that died back to the inbox.
+
+        Call after `acquire()`, before this daemon claims anything.
+        """
+        # processing/*.pdf were claimed by a daemon from before per-daemon dirs;
+        # our own directory may hold the claims of a previous process with the
+        # same name (a restarted container is pid 1 on the same host again)
+        moved = self._requeue_dir(self.processing_root)
+        moved += self._requeue_dir(self.processing)
+        for directory in sorted(self.processing_root.iterdir()):
+            if not directory.is_dir() or directory == self.processing:
+                continue
+            lock_path = self._lock_path(directory)
+            try:
+                fd = self._try_lock(lock_path)
+            except FileNotFoundError:
+                fd = -1  # lock already removed: its owner has shut down
+            if fd is None:
+                continue  # owner is alive
+            moved += self._requeue_dir(directory)
+            try:
+                directory.rmdir()
+                lock_path.unlink()
+            except OSError:
+                pass
+            finally:
+                if fd >= 0:
+                    os.close(fd)
+        if moved:
+            print(f"↩️ Requeued {moved} file(s) left in {self.processing_root}")
+        self.stats["requeued"] += moved
+        return moved
+
+    def scan(self, limit: int) -> List[Tuple[int, str, int]]:
+        """Oldest *limit* inbox PDFs as (mtime_ns, name, size); counts the backlog."""
+        heap: List[Tuple[int, str, int]] = []  # max-heap on mtime via negation
+        count = 0
+        with os.scandir(self.inbox) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith(".pdf") or not entry.is_file():
+                    continue
+                count += 1
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue  # claimed or removed meanwhile
+                item = (-st.st_mtime_ns, entry.name, st.st_size)
+                if len(heap) < limit:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+        self.backlog = count
+        return sorted((-m, name, size) for m, name, size in heap)
+
+    def stable_files(self, limit: int) -> List[str]:
+        """Names whose size and mtime did not change since the previous poll."""
+        now_ns = time.time_ns()
+        stable, sizes = [], {}
+        for mtime_ns, name, size in self.scan(limit):
+            signature = (size, mtime_ns)
+            age_sec = (now_ns - mtime_ns) / 1e9
+            if self._sizes.get(name) == signature and age_sec >= self.settle_sec:
+                if size > 0:
+                    stable.append(name)
+                elif age_sec >= self.empty_sec:
+                    # Never claimed, it would sit in the scan window forever
+                    self._fail_empty(name)
+                    continue
+            sizes[name] = signature
+        self._sizes = sizes  # only the current window is remembered
+        return stable
+
+    def claim(self, name: str) -> Optional[Path]:
+        dst = unique_path(self.processing, name)
+        try:
+            os.rename(self.inbox / name, dst)
+        except FileNotFoundError:
+            return None  # another consumer got it first
+        self._sizes.pop(name, None)
+        self.stats["claimed"] += 1
+        return dst
+
+    # ── completion ────────────────────────────────────────────────────
+    def _log(self, entry: Dict[str, Any]) -> None:
+        with (self.output_dir / "watch_log.jsonl").open("a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+    def _requeue(self, path: Path, reason: str) -> None:
+        """Hand a claimed file back to the inbox; it was not processed."""
+        os.rename(path, unique_path(self.inbox, path.name))
+        self._log({"file": path.name, "status": "requeued", "error": reason})
+        self.stats["requeued"] += 1
+        print(f"↩️ {path.name} requeued: {reason}")
+
+    def _finish(self, future: Future) -> None:
+        path, ingested_at = self.in_flight.pop(future)
+        error = future.exception()
+        if isinstance(error, (BrokenExecutor, KeyboardInterrupt)):
+            # The worker died, not the document: stop claiming, retry it later
+            self._stop = True
+            self._requeue(path, f"{type(error).__name__}: {error}")
+            return
+        latency = time.time() - ingested_at
+        entry = {"file": path.name, "latency_sec": round(latency, 3)}
+        if error is None:
+            os.rename(path, unique_path(self.done, path.name))
+            self._log({**entry, "status": "done", "result": future.result()})
+            self.stats["done"] += 1
+            self.latencies.append(latency)
+            print(
+                f"📥 {path.name} done in {latency:.1f}s since arrival "
+                f"(backlog {self.backlog}, in flight {len(self.in_flight)})"
+            )
+            return
+        self._fail(
+            path,
+            f"{type(error).__name__}: {error}",
+            "".join(traceback.format_exception(type(error), error, error.__traceback__)),
+            entry,
+        )
+
+    def _fail(self, path: Path, error: str, tb: str, entry: Dict[str, Any]) -> None:
+        """Move *path* to failed/ next to a <name>.error.json report."""
+        target = unique_path(self.failed, path.name)
+        try:
+            os.rename(path, target)
+        except FileNotFoundError:
+            return  # an empty inbox file that another daemon took first
+        report = {
+            "file": path.name,
+            "error": error,
+            "traceback": tb,
+            "failed_at": time.time(),
+        }
+        target.with_suffix(".error.json").write_text(json.dumps(report, indent=2))
+        self._log({**entry, "status": "failed", "error": error})
+        self.stats["failed"] += 1
+        print(f"❌ {path.name} failed: {error}")
+
+    def _fail_empty(self, name: str) -> None:
+        self._sizes.pop(name, None)
+        self._fail(
+            self.inbox / name,
+            f"EmptyFile: still 0 bytes after {self.empty_sec:g}s",
+            "",
+            {"file": name},
+        )
+
+    # ── metrics ───────────────────────────────────────────────────────
+    def status(self) -> Dict[str, Any]:
+        uptime = time.time() - self.stats["started_at"]
+        latency = np.array(self.latencies) if self.latencies else None
+        return {
+            **self.stats,
+            "updated_at": time.time(),
+            "backlog": self.backlog,
+            "in_flight": len(self.in_flight),
+            "docs_per_min": round(self.stats["done"] / uptime * 60, 2) if uptime else 0.0,
+            # over the last `latencies.maxlen` documents
+            "latency_sec": {
+                "p50": round(float(np.percentile(latency, 50)), 3),
+                "p90": round(float(np.percentile(latency, 90)), 3),
+                "max": round(float(latency.max()), 3),
+            }
+            if latency is not None
+            else None,
+        }
+
+    def write_status(self, force: bool = False) -> None:
+        """Atomically refresh <output_dir>/watch_status.json (every poll)."""
+        status = self.status()
+        path = self.output_dir / "watch_status.json"
+        tmp = path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(status, indent=2))
+        os.replace(tmp, path)
+        if force or time.time() - self._last_status >= self.status_every:
+            self._last_status = time.time()
+            print(
+                f"📊 backlog {status['backlog']}, in flight {status['in_flight']}, "
+                f"done {status['done']}, failed {status['failed']}"
+            )
+
+    # ── main loop ─────────────────────────────────────────────────────
+    def stop(self, *_) -> None:
+        """Stop claiming; files in flight are still finished."""
+        self._stop = True
+
+    def run(self, idle_exit: float = None) -> Dict[str, Any]:
+        """Poll until stopped (SIGINT/SIGTERM) or, with *idle_exit*, until the
+        inbox stayed empty and nothing was in flight for that many seconds."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self.stop)
+        self.acquire()
+        self.requeue_orphans()
+        print(f"👀 Watching {self.inbox} (max {self.max_in_flight} in flight)")
+        idle_since = time.time()
+
+        while not self._stop:
+            free = self.max_in_flight - len(self.in_flight)
+            if free > 0:
+                for name in self.stable_files(4 * self.max_in_flight)[:free]:
+                    path = self.claim(name)
+                    if path is None:
+                        continue
+                    # Arrival = last write of the file, i.e. when the copy finished
+                    ingested_at = path.stat().st_mtime
+                    try:
+                        future = self.pool.submit(self.task, str(path), self.output_dir)
+                    except BrokenExecutor as e:
+                        self._stop = True
+                        self._requeue(path, f"{type(e).__name__}: {e}")
+                        break
+                    self.in_flight[future] = (path, ingested_at)
+
+            if self.in_flight:
+                done, _ = wait(
+                    list(self.in_flight), timeout=self.poll_sec, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    self._finish(future)
+            else:
+                time.sleep(self.poll_sec)
+
+            if self.in_flight or self.backlog:
+                idle_since = time.time()
+            elif idle_exit is not None and time.time() - idle_since >= idle_exit:
+                break
+            self.write_status()
+
+        for future in list(self.in_flight):
+            future.exception()  # wait
+            self._finish(future)
+        self.release()
+        self.write_status(force=True)
+        return self.status()
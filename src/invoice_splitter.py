@@ -0,0 +1,105 @@
+import re
+from typing import List, Dict, Any
+
+from src.regex_extraction_helpers import PATTERNS, extract_supplier_info
+
+# ----------------- Boundary Patterns -------------------
+BOUNDARY_PATTERNS = {
+    "page_x_of_n": re.compile(
+        r"\bPage\s*(?P<page>\d{1,3})\s*(?:of|/)\s*(?P<total>\d{1,3})\b", re.IGNORECASE
+    ),
+    "invoice_title": re.compile(r"^\s*(?:TAX\s*)?INVOICE\s*$", re.IGNORECASE),
+}
+
+
+# ----------------- Page Signals ----------------------
+def page_signals(text: str) -> Dict[str, Any]:
+    """Collect the per-page cues used to decide where a new invoice starts."""
+    head = "\n".join(text.splitlines()[:15])
+
+    # Footers such as “include invoice number in payment reference” also hit
+    # the pattern, so only accept candidates that look like an identifier.
+    invoice_no = next(
+        (
+            m.group("inv").strip()
+            for m in PATTERNS["invoice_no"].finditer(text)
+            if re.search(r"\d", m.group("inv"))
+        ),
+        "",
+    )
+    m_page = BOUNDARY_PATTERNS["page_x_of_n"].search(text)
+    supplier = extract_supplier_info(head)
+
+    return {
+        "invoice_no": invoice_no,
+        "page_of": (int(m_page.group("page")), int(m_page.group("total")))
+        if m_page
+        else None,
+        "supplier_header": bool(supplier["name"]),
+        "invoice_title": any(
+            BOUNDARY_PATTERNS["invoice_title"].match(ln) for ln in head.splitlines()
+        ),
+        "totals_footer": bool(PATTERNS["subtotal"].search(text)),
+    }
+
+
+def _boundary_reasons(
+    signals: Dict[str, Any], prev: Dict[str, Any], current_inv: str
+) -> List[str]:
+    reasons = []
+    if signals["page_of"] and signals["page_of"][0] == 1:
+        reasons.append("page_1_of_n")
+    if signals["invoice_no"] and current_inv and signals["invoice_no"] != current_inv:
+        reasons.append("new_invoice_no")
+    # A header repeating the current invoice number is a continuation page
+    # (running subtotals are common on multi-page invoices)
+    same_invoice = bool(current_inv) and signals["invoice_no"] == current_inv
+    if (
+        prev["totals_footer"]
+        and not same_invoice
+        and (
+            signals["supplier_header"]
+            or signals["invoice_title"]
+            or signals["invoice_no"]
+        )
+    ):
+        reasons.append("header_after_totals")
+    return reasons
+
+
+# ----------------- Splitter --------------------------
+def split_invoices(pages_text: List[str]) -> List[Dict[str, Any]]:
+    """
+    Group consecutive pages into logical invoices.
+
+    A page opens a new invoice when it reads “Page 1 of N”, carries an invoice
+    number different from the one seen so far, or shows a supplier/invoice
+    header right after a page that closed with a totals footer.
+
+    Returns one dict per invoice: {"pages": [1-based page numbers],
+    "invoice_no": str, "reasons": [why this segment was opened]}.
+    """
+    segments: List[Dict[str, Any]] = []
+    prev: Dict[str, Any] = {}
+    current: Dict[str, Any] = {}
+
+    for idx, text in enumerate(pages_text, start=1):
+        signals = page_signals(text)
+        reasons = (
+            _boundary_reasons(signals, prev, current["invoice_no"]) if current else []
+        )
+
+        if not current or reasons:
+            current = {
+                "pages": [],
+                "invoice_no": "",
+                "reasons": reasons or ["first_page"],
+            }
+            segments.append(current)
+
+        current["pages"].append(idx)
+        if not current["invoice_no"]:
+            current["invoice_no"] = signals["invoice_no"]
+        prev = signals
+
+    return segments
@@ -54,6 +54,31 @@ def normalize_decimal(s: str) -> float:
         return 0.0
 
 
+# ----------------- OCR Sanity Checks -----------------
+_MONEY_LABEL = re.compile(
+    r"\b(?:Unit\s*Price|Price|Rate|Am[o0]unt|Subtotal|Total|VAT)\b", re.IGNORECASE
+)
+_NUMERIC_TOKEN = re.compile(r"[\dlIO.,]*\d[\dlIO.,]*")
+_STRICT_AMOUNT = re.compile(
+    r"\d{1,3}(?:,\d{3})+(?:\.\d{1,2})?|\d+(?:[.,]\d{1,2})?|\d+"
+)
+
+
+def numeric_field_suspect(line: str) -> bool:
+    """True when a price/total field on *line* holds a malformed amount.
+
+    Catches OCR confusions such as ``$1,2O0.00`` or ``Total: 1.234.5l`` that
+    `normalize_decimal` would otherwise guess at.
+    """
+    m = _MONEY_LABEL.search(line)
+    if not m:
+        return False
+    for token in _NUMERIC_TOKEN.findall(line, m.end()):
+        if not _STRICT_AMOUNT.fullmatch(token.rstrip(".,")):
+            return True
+    return False
+
+
 # ----------------- Field Extractors ------------------
 def extract_supplier_info(text: str) -> Dict[str, str]:
     lines = text.splitlines()[:10]
@@ -281,3 +306,28 @@ def extract_line_items(text: str, general_po: str) -> List[Dict[str, Any]]:
         items.append(current_item)
 
     return items
+
+
+# ----------------- Whole Invoice ---------------------
+def extract_invoice(pages_text: List[str]) -> Dict[str, Any]:
+    """Run every field extractor over the OCR text of one logical invoice."""
+    combined_text = "\n".join(pages_text)
+
+    m_global_po = re.search(
+        r"\bPONUMBER[:\s]*PO[-\s]*(?P<po>\d{4,10})\b", combined_text, re.IGNORECASE
+    )
+    general_po = f"PO-{m_global_po.group('po')}" if m_global_po else ""
+
+    first_page_text = pages_text[0] if pages_text else ""
+    supplier_info = extract_supplier_info(first_page_text)
+    header_fields = extract_header_fields(combined_text)
+    items = extract_line_items(combined_text, general_po)
+    totals = extract_totals(combined_text)
+
+    return {
+        "supplier": supplier_info,
+        "invoice_no": header_fields.get("invoice_no", ""),
+        "date": header_fields.get("date", ""),
+        "items": items,
+        "totals": totals,
+    }
@@ -0,0 +1,48 @@
+import pytest
+
+from src.Deadline import Deadline, StageCosts
+
+
+def deadline(budget=10.0, ocr_page=1.0):
+    return Deadline(budget, StageCosts(ocr_page=ocr_page), margin=0.0)
+
+
+def steps(d):
+    return [x["step"] for x in d.degradations]
+
+
+def test_ocr_estimates_scale_with_pixel_count():
+    costs = StageCosts(ocr_page=1.0)
+    assert costs.estimate("ocr_page", 150) == pytest.approx(0.25)
+    costs.observe("ocr_page", 0.5, dpi=150)  # 2.0 s at the reference DPI
+    assert costs.estimate("ocr_page") == pytest.approx(0.7 * 1.0 + 0.3 * 2.0)
+
+
+def test_pages_that_fit_are_ocrd_as_asked():
+    d = deadline()
+    assert d.plan_ocr(8, 300) == (300, list(range(1, 9)))
+    assert d.degradations == []
+
+
+def test_dpi_steps_down_the_ladder_before_dropping_pages():
+    d = deadline()
+    assert d.plan_ocr(20, 300) == (200, list(range(1, 21)))
+    assert d.degradations[0]["from_dpi"] == 300 and steps(d) == ["lower_dpi"]
+    # 8 pages fit at 300 DPI alone, not next to a 5 s LLM call
+    assert deadline().plan_ocr(8, 300, reserve=5.0)[0] == 200
+
+
+def test_first_and_last_page_when_even_the_lowest_dpi_is_too_slow():
+    d = deadline()
+    assert d.plan_ocr(60, 300) == (150, [1, 60])
+    assert steps(d) == ["lower_dpi", "first_last_pages"]
+
+
+def test_trim_jumps_to_the_last_page_when_ocr_runs_slow():
+    d = deadline()
+    pages = [1, 2, 3, 4, 5, 6]
+    assert d.trim_pages(pages, 2, 300) == pages
+    d.costs.estimates["ocr_page"] = 3.0
+    assert d.trim_pages(pages, 2, 300) == [1, 2, 6]
+    # Once applied, the plan is not trimmed again
+    assert d.trim_pages(pages, 2, 300) == pages and steps(d) == ["first_last_pages"]
@@ -0,0 +1,76 @@
+import sqlite3
+
+from src.Dedup import DedupStore
+
+
+def test_documents_are_keyed_by_options(tmp_path):
+    store = DedupStore(tmp_path / "dedup.sqlite")
+    store.add_document("abc", "regex", {"lazy_ocr": False}, {"invoice.json": {}}, 1.0)
+    assert store.lookup_document("abc", "regex", {"lazy_ocr": False}) == {
+        "invoice.json": {}
+    }
+    assert store.lookup_document("abc", "regex", {"lazy_ocr": True}) is None
+    assert store.lookup_document("abc", "llm", {"lazy_ocr": False}) is None
+    store.close()
+
+
+def test_documents_of_an_older_store_are_dropped(tmp_path):
+    path = tmp_path / "dedup.sqlite"
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE documents (sha256 TEXT NOT NULL, method TEXT NOT NULL, "
+        "result TEXT, ocr_sec REAL, PRIMARY KEY (sha256, method))"
+    )
+    conn.execute("INSERT INTO documents VALUES ('abc', 'regex', '{}', 1.0)")
+    conn.commit()
+    conn.close()
+
+    store = DedupStore(path)
+    assert store.lookup_document("abc", "regex", {}) is None
+    store.add_document("abc", "regex", {}, {}, 1.0)
+    assert store.lookup_document("abc", "regex", {}) == {}
+    store.close()
+
+
+def test_pages_round_trip_their_line_texts_and_stats(tmp_path):
+    from PIL import Image
+
+    store = DedupStore(tmp_path / "dedup.sqlite")
+    img = Image.new("RGB", (160, 160), "white")
+    ocr = ("a b", [0.9, 0.8], [[0, 0, 10, 5], [0, 10, 10, 5]], ["a ", "b"])
+    options = {"dpi": 300, "two_pass": [150, 0.9]}
+    store.add_page(img, ocr, 1.0, options=options, stats={"replaced_lines": 1})
+    (cached, saved, stats), _, _ = store.lookup_page(img, options)
+    assert cached[3] == ["a ", "b"] and saved == 1.0
+    assert stats == {"replaced_lines": 1}
+    store.close()
+
+
+def test_pages_are_keyed_by_ocr_options(tmp_path):
+    from PIL import Image
+
+    store = DedupStore(tmp_path / "dedup.sqlite")
+    img = Image.new("RGB", (160, 160), "white")
+    ocr = ("a", [0.9], [[0, 0, 10, 5]], ["a"])
+    store.add_page(img, ocr, 1.0, options={"dpi": 300, "lang": "en"})
+    assert store.lookup_page(img, {"dpi": 300, "lang": "fr"})[0] is None
+    assert store.lookup_page(img, {"dpi": 200, "lang": "en"})[0] is None
+    assert store.lookup_page(img, {"lang": "en", "dpi": 300})[0] is not None
+    store.close()
+
+
+def test_pages_of_an_older_store_are_dropped(tmp_path):
+    path = tmp_path / "dedup.sqlite"
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE pages (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "phash TEXT NOT NULL, width INTEGER, height INTEGER, thumb BLOB, "
+        "ocr TEXT, ocr_sec REAL)"
+    )
+    conn.commit()
+    conn.close()
+
+    store = DedupStore(path)
+    columns = [r[1] for r in store.conn.execute("PRAGMA table_info(pages)")]
+    assert "options" in columns and "stats" in columns
+    store.close()
@@ -0,0 +1,70 @@
+from src.invoice_splitter import page_signals, split_invoices
+
+HEADER = """GLOBAL TECH SOLUTIONS LTD.
+123 Innovation Street
+VAT:GB123456789
+INVOICE
+Invoice Number: {inv}
+Invoice Date: 20/02/2025"""
+
+ITEMS = """DESCRIPTION
+Backend API Integration
+Quantity: 2
+Unit Price: $100.00
+Amount: $200.00"""
+
+FOOTER = """Subtotal: $200.00
+VAT (20%): $40.00
+Total: $240.00"""
+
+
+def page(inv="INV-100", footer=False, header=True):
+    parts = [HEADER.format(inv=inv)] if header else []
+    parts.append(ITEMS)
+    if footer:
+        parts.append(FOOTER)
+    return "\n".join(parts)
+
+
+def test_single_page_is_one_invoice():
+    segments = split_invoices([page(footer=True)])
+    assert [s["pages"] for s in segments] == [[1]]
+    assert segments[0]["invoice_no"] == "INV-100"
+    assert segments[0]["reasons"] == ["first_page"]
+
+
+def test_continuation_page_without_header_stays_in_invoice():
+    segments = split_invoices([page(), page(header=False, footer=True)])
+    assert [s["pages"] for s in segments] == [[1, 2]]
+
+
+def test_repeated_header_after_running_subtotal_stays_in_invoice():
+    # Page 1 closes with a running subtotal, page 2 repeats the same header
+    segments = split_invoices([page(footer=True), page(footer=True)])
+    assert [s["pages"] for s in segments] == [[1, 2]]
+
+
+def test_new_invoice_number_opens_segment():
+    segments = split_invoices(
+        [page("INV-100", footer=True), page("INV-200", footer=True)]
+    )
+    assert [s["pages"] for s in segments] == [[1], [2]]
+    assert [s["invoice_no"] for s in segments] == ["INV-100", "INV-200"]
+    assert "new_invoice_no" in segments[1]["reasons"]
+    assert "header_after_totals" in segments[1]["reasons"]
+
+
+def test_page_1_of_n_opens_segment():
+    pages = [
+        page("INV-100") + "\nPage 1 of 2",
+        page(header=False, footer=True) + "\nPage 2 of 2",
+        page(header=False, footer=True) + "\nPage 1 of 1",
+    ]
+    segments = split_invoices(pages)
+    assert [s["pages"] for s in segments] == [[1, 2], [3]]
+    assert segments[1]["reasons"] == ["page_1_of_n"]
+
+
+def test_payment_reference_footer_is_not_an_invoice_number():
+    signals = page_signals("Please include invoice number in payment reference")
+    assert signals["invoice_no"] == ""
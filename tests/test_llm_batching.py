@@ -0,0 +1,41 @@
+from src.LLMBatching import LLMInvoiceBatcher
+
+INVOICE = {
+    "supplier": {"name": "ACME", "vat": "1"},
+    "invoice_no": "INV-1",
+    "items": [],
+    "totals": {"subtotal": 1.0, "vat": 0.0, "total": 1.0},
+}
+
+
+class FailingClient:
+    def __init__(self):
+        self.chat = self
+        self.completions = self
+
+    def create(self, **kwargs):
+        raise TimeoutError("request timed out")
+
+
+class Job:
+    def __init__(self, key):
+        self.doc_key = key
+        self.messages = [{"role": "system", "content": ""}, {"role": "user", "content": key}]
+        self.result = self.usage = None
+
+    def complete_blocking(self, messages):
+        return dict(INVOICE), {"prompt_tokens": 3, "completion_tokens": 2}
+
+    def finish(self, result, usage):
+        self.result, self.usage = result, usage
+
+
+def test_failed_packed_request_falls_back_to_single_requests():
+    batcher = LLMInvoiceBatcher(FailingClient(), "m", "sys", token_budget=1000)
+    jobs = [Job(f"doc{i}") for i in range(3)]
+    for job in jobs:
+        batcher.add(job)
+    batcher.close()
+    assert all(job.result == INVOICE for job in jobs)
+    assert all("TimeoutError" in job.usage["batch"]["fallback"] for job in jobs)
+    assert batcher.report()["fallbacks"] == 3
@@ -0,0 +1,79 @@
+import json
+from types import SimpleNamespace
+
+from src.LLMStreaming import stream_invoice
+
+ITEM = {"description": "Bolt", "qty": 1, "unit_price": 2.0, "line_total": 2.0}
+INVOICE = {
+    "supplier": {"name": "ACME", "vat": "1"},
+    "invoice_no": "INV-1",
+    "date": "2024-01-01",
+    "items": [ITEM, ITEM, dict(ITEM, description="Nut")],
+    "totals": {"subtotal": 6.0, "vat": 0.0, "total": 6.0},
+}
+
+
+class Usage(dict):
+    def model_dump(self):
+        return dict(self)
+
+
+def chunks(text, usage=None, size=7):
+    for i in range(0, len(text), size):
+        delta = SimpleNamespace(content=text[i : i + size])
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+    if usage:
+        yield SimpleNamespace(choices=[], usage=Usage(usage))
+
+
+class FakeClient:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        return self.responses.pop(0)
+
+
+def test_reask_replays_are_sent_once_and_repeated_items_kept():
+    good = json.dumps(INVOICE)
+    # Diverges on the third item, after the two identical ones were streamed
+    bad = good[: good.index('{"description": "Nut"')] + '{"colour": "red"}]}'
+    usage = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+    client = FakeClient([chunks(bad, usage), chunks(good, usage)])
+    events = []
+    result, total, stats = stream_invoice(
+        client, "m", [{}, {}], on_event=lambda *e: events.append(e)
+    )
+    assert result["invoice_no"] == "INV-1" and stats["reasks"] == 1
+    assert [e[1]["description"] for e in events if e[0] == "item"] == [
+        "Bolt",
+        "Bolt",
+        "Nut",
+    ]
+    assert [e[0] for e in events].count("supplier") == 1
+    # The aborted attempt never got its usage chunk: it is estimated
+    assert total["total_tokens"] > 15 and stats["usage_estimated"]
+
+
+def test_usage_of_every_reported_attempt_is_summed():
+    good = json.dumps(INVOICE)
+    bad = good.replace('"qty": 1', '"qty": "one"', 1)
+    usage = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+    # Usage first: the chunk arrives before the stream diverges
+    first = [*list(chunks("", usage)), *chunks(bad)]
+    client = FakeClient([iter(first), chunks(good, usage)])
+    _, total, stats = stream_invoice(client, "m", [{}, {}])
+    assert total == {"prompt_tokens": 20, "completion_tokens": 10, "total_tokens": 30}
+    assert not stats["usage_estimated"]
+
+
+def test_null_header_fields_are_not_divergence():
+    invoice = dict(INVOICE, invoice_no=None, date=None)
+    client = FakeClient([chunks(json.dumps(invoice))])
+    events = []
+    result, _, stats = stream_invoice(
+        client, "m", [{}, {}], on_event=lambda *e: events.append(e)
+    )
+    assert result["invoice_no"] is None and stats["reasks"] == 0
+    assert ("header", {"invoice_no": None, "date": None}) in events
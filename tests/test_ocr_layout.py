@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from src.OCRLayout import DocumentLayout, PageLayout, polys_to_xywh
+
+
+def document():
+    layout = DocumentLayout()
+    layout.append(PageLayout.from_ocr(1, ["Invoice", "Total: €12"], [0.9, 0.8], [[0, 0, 50, 10], [0, 20, 60, 10]]))
+    layout.append(PageLayout.from_ocr(2, ["Çà va"], [0.7], [[5, 5, 40, 10]]))
+    return layout
+
+
+def test_polygons_become_xywh_boxes():
+    boxes = polys_to_xywh([[[10, 20], [40, 20], [40, 30], [10, 30]]])
+    assert boxes.tolist() == [[10, 20, 30, 10]]
+    assert polys_to_xywh([]).shape == (0, 4)
+
+
+def test_pages_are_views_of_the_merged_columns():
+    layout = document()
+    assert layout.texts == ["Invoice", "Total: €12", "Çà va"]
+    second = layout.page(2)
+    assert second.texts == ["Çà va"] and second.pages.tolist() == [2]
+    assert np.shares_memory(second.boxes, layout.boxes)
+    assert layout.page(1)[-1] == {"page": 1, "text": "Total: €12", "score": 0.8, "box": [0, 20, 60, 10]}
+    assert len(layout.page(3)) == 0
+
+
+def test_npz_round_trip_keeps_non_ascii_texts(tmp_path):
+    layout = document()
+    layout.save_npz(tmp_path / "layout.npz")
+    loaded = DocumentLayout.load_npz(tmp_path / "layout.npz")
+    assert loaded.to_records() == layout.to_records()
+
+
+def test_arrow_table_matches_the_records():
+    pytest.importorskip("pyarrow")
+    table = document().to_arrow()
+    assert table.column("text").to_pylist() == ["Invoice", "Total: €12", "Çà va"]
+    assert table.column("box").to_pylist()[2] == [5, 5, 40, 10]
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.Preprocessing import PagePreprocessor, otsu_threshold, to_grayscale
+
+
+def ink_centroid(img):
+    ys, xs = np.nonzero(to_grayscale(np.asarray(img)) < 128)
+    return np.array([xs.mean(), ys.mean()])
+
+
+def text_page(angle=0.0):
+    """White 600×400 page with ten dark text-like bars, rotated by *angle*."""
+    page = np.full((400, 600), 255, dtype=np.uint8)
+    for k in range(10):
+        page[80 + 25 * k : 88 + 25 * k, 120 : 420 + 10 * k] = 0
+    img = Image.fromarray(page).rotate(angle, resample=Image.BILINEAR, fillcolor=255)
+    return img.convert("RGB")
+
+
+def test_grayscale_and_otsu_split_a_two_tone_page():
+    rgb = np.full((10, 10, 3), 220, dtype=np.uint8)
+    rgb[:4] = 40
+    gray = to_grayscale(rgb)
+    assert gray[0, 0] == 40 and gray[-1, -1] == 220
+    assert 40 < otsu_threshold(gray) <= 220  # ink is gray < threshold
+    assert to_grayscale(np.full((1, 1, 3), 255, dtype=np.uint8))[0, 0] == 255
+
+
+def test_crop_maps_boxes_back_to_page_pixels():
+    img, transform = PagePreprocessor(margin=10)(text_page())
+    assert transform.angle == 0.0
+    assert transform.crop == (110, 70, 520, 323)
+    assert img.size == (410, 253)
+    assert transform.to_original(np.array([[0, 0], [10, 10]])).tolist() == [
+        [110, 70],
+        [120, 80],
+    ]
+
+
+def test_deskew_is_undone_by_to_original():
+    original = text_page(angle=2.0)
+    img, transform = PagePreprocessor(binarize=True)(original)
+    assert transform.angle == pytest.approx(-2.0, abs=0.3)
+    assert set(np.unique(np.asarray(img))) <= {0, 255}
+    mapped = transform.to_original(ink_centroid(img)[None])[0]
+    assert np.abs(mapped - ink_centroid(original)).max() < 2.0
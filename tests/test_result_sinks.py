@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from src.ResultSinks import JSONLResultSink, make_record
+
+
+def record(name):
+    return make_record(name, "regex", {"invoice_no": name})
+
+
+def files(sink):
+    return [r["file"] for r in sink.records()]
+
+
+def test_committed_batches_are_read_back(tmp_path):
+    sink = JSONLResultSink(tmp_path / "r.jsonl", batch_size=2)
+    for name in ("a", "b", "c"):
+        sink.add(record(name))
+    sink.close()
+    assert files(sink) == ["a", "b", "c"]
+    assert "__batch__" not in next(sink.records())
+
+
+def test_orphan_rows_do_not_join_the_next_batch(tmp_path):
+    path = tmp_path / "r.jsonl"
+    crashed = dict(record("crashed"), result="{}", __batch__="dead")
+    path.write_text(json.dumps(crashed) + "\n")
+    with JSONLResultSink(path) as sink:
+        sink.add(record("good"))
+    assert files(sink) == ["good"]
+
+
+def test_torn_tail_is_skipped(tmp_path):
+    path = tmp_path / "r.jsonl"
+    with JSONLResultSink(path) as sink:
+        sink.add(record("first"))
+    with path.open("a") as f:
+        f.write('{"file": "torn", "res')
+    assert files(sink) == ["first"]
+    with JSONLResultSink(path) as sink:
+        sink.add(record("second"))
+    assert files(sink) == ["first", "second"]
+
+
+def test_predictions_of_mixed_methods_need_a_method(tmp_path):
+    sink = JSONLResultSink(tmp_path / "r.jsonl")
+    sink.add(record("a"))
+    sink.add(make_record("a", "llm", {"invoice_no": "llm"}))
+    sink.close()
+    with pytest.raises(ValueError, match="several methods"):
+        sink.read_predictions()
+    assert sink.read_predictions("llm") == {"a": {"invoice_no": "llm"}}
@@ -0,0 +1,31 @@
+from src.SpatialIndex import PageSpatialIndex
+from src.regex_extraction_helpers import extract_totals
+
+
+def index(lines):
+    """lines: (text, x, y) with 100×20 px boxes."""
+    return PageSpatialIndex([t for t, _, _ in lines], [[x, y, 100, 20] for _, x, y in lines])
+
+
+def test_columns_mode_keeps_label_value_rows_together():
+    page = index(
+        [
+            ("Subtotal:", 400, 700), ("$10.00", 600, 700),
+            ("VAT (20%):", 400, 730), ("$2.00", 600, 730),
+            ("Total:", 400, 760), ("$12.00", 600, 760),
+        ]
+    )
+    text = page.reading_order_text("columns")
+    assert text.splitlines() == ["Subtotal: $10.00", "VAT (20%): $2.00", "Total: $12.00"]
+    assert extract_totals(text) == {"subtotal": 10.0, "vat": 2.0, "total": 12.0}
+
+
+def test_columns_mode_reads_side_by_side_blocks_one_at_a_time():
+    sender = ["ACME Ltd", "1 Main Street", "Springfield", "VAT GB123"]
+    client = ["Bill to", "Foo GmbH", "2 Side Road", "Berlin"]
+    page = index(
+        [(t, 50, 100 + 30 * k) for k, t in enumerate(sender)]
+        + [(t, 500, 100 + 30 * k) for k, t in enumerate(client)]
+    )
+    assert page.reading_order_text("columns").splitlines() == sender + client
+    assert page.reading_order_text("rows").splitlines()[0] == "ACME Ltd Bill to"
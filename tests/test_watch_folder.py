@@ -0,0 +1,95 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from src.WatchFolder import WatchFolder
+
+
+def drop(inbox, name):
+    inbox.mkdir(parents=True, exist_ok=True)
+    (inbox / name).write_bytes(b"%PDF-1.4 test")
+
+
+def watch(tmp_path, task):
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        watcher = WatchFolder(
+            tmp_path / "inbox", pool, task, tmp_path / "out", poll_sec=0.05, settle_sec=0
+        )
+        return watcher, watcher.run(idle_exit=0.3)
+
+
+def test_files_end_in_done_or_failed(tmp_path):
+    drop(tmp_path / "inbox", "good.pdf")
+    drop(tmp_path / "inbox", "bad.pdf")
+
+    def task(pdf_path, output_dir):
+        if "bad" in pdf_path:
+            raise ValueError("unreadable")
+        return {"pdf": pdf_path}
+
+    _, status = watch(tmp_path, task)
+    assert (status["done"], status["failed"]) == (1, 1)
+    assert (tmp_path / "inbox/done/good.pdf").exists()
+    assert (tmp_path / "inbox/failed/bad.error.json").exists()
+
+
+def test_broken_pool_requeues_instead_of_failing(tmp_path):
+    drop(tmp_path / "inbox", "a.pdf")
+
+    def task(pdf_path, output_dir):
+        raise BrokenProcessPool("worker died")
+
+    _, status = watch(tmp_path, task)
+    assert status["failed"] == 0 and status["requeued"] == 1
+    assert (tmp_path / "inbox/a.pdf").exists()
+    assert not list((tmp_path / "inbox/failed").iterdir())
+    log = (tmp_path / "out/watch_log.jsonl").read_text().splitlines()
+    assert json.loads(log[-1])["status"] == "requeued"
+
+
+def test_only_files_of_dead_daemons_are_requeued(tmp_path):
+    inbox = tmp_path / "inbox"
+    live = WatchFolder(inbox, None, None, tmp_path / "out")
+    live.acquire()
+    (live.processing / "busy.pdf").write_bytes(b"%PDF")
+    dead = inbox / "processing" / "otherhost-1"
+    dead.mkdir()
+    (dead / "lost.pdf").write_bytes(b"%PDF")
+    (inbox / "processing" / "otherhost-1.lock").touch()
+
+    starting = WatchFolder(inbox, None, None, tmp_path / "out")
+    starting.processing = inbox / "processing" / "second"
+    starting.acquire()
+    assert starting.requeue_orphans() == 1
+    assert (inbox / "lost.pdf").exists() and not dead.exists()
+    assert (live.processing / "busy.pdf").exists()
+    live.release()
+    starting.release()
+
+
+def test_restart_under_the_same_name_requeues_its_claims(tmp_path):
+    inbox = tmp_path / "inbox"
+    previous = WatchFolder(inbox, None, None, tmp_path / "out")
+    previous.processing.mkdir()
+    (previous.processing / "claimed.pdf").write_bytes(b"%PDF")
+
+    restarted = WatchFolder(inbox, None, None, tmp_path / "out")
+    assert restarted.processing == previous.processing
+    restarted.acquire()
+    assert restarted.requeue_orphans() == 1
+    assert (inbox / "claimed.pdf").exists()
+    restarted.release()
+
+
+def test_files_that_stay_empty_are_failed(tmp_path):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    (inbox / "empty.pdf").touch()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        watcher = WatchFolder(
+            inbox, pool, None, tmp_path / "out", poll_sec=0.05, settle_sec=0, empty_sec=0.1
+        )
+        status = watcher.run(idle_exit=0.3)
+    assert status["failed"] == 1 and status["backlog"] == 0
+    report = json.loads((inbox / "failed/empty.error.json").read_text())
+    assert report["error"].startswith("EmptyFile")